@@ -94,24 +94,25 @@ class ShortStraddle(BaseStrategy):
             return
         com = self._order
         s1, s2 = self.symbols
-        order1 = Order(symbol=s1, side="sell", quantity=self.quantity)
-        order1.price = self.limit_price[0]
-        order2 = order1.clone()
-        order2.symbol = s2
-        order2.price = self.limit_price[1]
+        order1 = Order(
+            symbol=s1, side="sell", quantity=self.quantity, price=self.limit_price[0]
+        )
+        order2 = order1.clone(symbol=s2, price=self.limit_price[1])
         com.add(order1)
         com.add(order2)
-        order1stop = order1.clone()
-        order1stop.trigger_price = self.trigger_price[0]
-        order1stop.price = self.stop_price[0]
-        order1stop.order_type = "SL"
-        order1stop.side = "buy"
+        order1stop = order1.clone(
+            trigger_price=self.trigger_price[0],
+            price=self.stop_price[0],
+            order_type="SL",
+            side="buy",
+        )
         com.add(order1stop)
-        order2stop = order2.clone()
-        order2stop.trigger_price = self.trigger_price[1]
-        order2stop.price = self.stop_price[1]
-        order2stop.order_type = "SL"
-        order2stop.side = "buy"
+        order2stop = order2.clone(
+            trigger_price=self.trigger_price[1],
+            price=self.stop_price[1],
+            order_type="SL",
+            side="buy",
+        )
         com.add(order2stop)
         self._order_map["entry1"] = order1
         self._order_map["exit1"] = order1stop
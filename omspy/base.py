@@ -158,6 +158,29 @@ class Broker:
         """
         raise NotImplementedError
 
+    def order_cancel_batch(self, orders: List[Dict]) -> List:
+        """
+        Cancel multiple orders
+        orders
+            list of dictionaries, each with the order_id and other
+            keyword arguments to be passed to order_cancel
+        returns a list of responses in the same order as the orders
+        Note
+        ----
+        1) By default, order_cancel is called for each order; override
+        this for brokers that can cancel multiple orders in a single call
+        2) If an order could not be canceled, the exception is returned
+        in place of the response so that other orders are still canceled
+        """
+        responses: List = []
+        for order in orders:
+            try:
+                responses.append(self.order_cancel(**order))
+            except Exception as e:
+                logging.error(f"Order {order.get('order_id')} not canceled: {e}")
+                responses.append(e)
+        return responses
+
     @staticmethod
     def rename(dct, keys):
         """
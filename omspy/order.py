@@ -1,4 +1,4 @@
-from pydantic import BaseModel, validator, Field, PrivateAttr, Json
+from pydantic import BaseModel, validator, Field, PrivateAttr, Json, ValidationError
 from datetime import timezone
 from typing import (
     Optional,
@@ -11,18 +11,164 @@ from typing import (
     Callable,
     Set,
     Hashable,
+    ClassVar,
+    FrozenSet,
 )
+import os
 import uuid
+from copy import deepcopy
+import asyncio
 import pendulum
 import sqlite3
 import logging
 from collections import Counter, defaultdict
 from collections.abc import Iterable
+from operator import attrgetter
 from omspy.base import *
-from copy import deepcopy
 from sqlite_utils import Database
+from sqlite_utils.db import jsonify_if_needed
 from omspy.models import OrderLock
 
+# Columns of the orders table in the order they are created
+_ORDER_COLUMNS: Tuple[str, ...] = (
+    "symbol",
+    "side",
+    "quantity",
+    "id",
+    "parent_id",
+    "timestamp",
+    "order_type",
+    "broker_timestamp",
+    "exchange_timestamp",
+    "order_id",
+    "exchange_order_id",
+    "price",
+    "trigger_price",
+    "average_price",
+    "pending_quantity",
+    "filled_quantity",
+    "cancelled_quantity",
+    "disclosed_quantity",
+    "validity",
+    "status",
+    "expires_in",
+    "timezone",
+    "client_id",
+    "convert_to_market_after_expiry",
+    "cancel_after_expiry",
+    "retries",
+    "max_modifications",
+    "exchange",
+    "tag",
+    "can_peg",
+    "pseudo_id",
+    "strategy_id",
+    "portfolio_id",
+    "JSON",
+    "error",
+    "is_multi",
+    "last_updated_at",
+)
+
+# Order fields that change the state of an order; a change bumps its version
+_ORDER_STATE_FIELDS = frozenset(
+    {
+        "quantity",
+        "filled_quantity",
+        "cancelled_quantity",
+        "status",
+        "average_price",
+        "side",
+        "symbol",
+    }
+)
+
+# Get the values of an order in the order of the table columns
+_get_order_values = attrgetter(*_ORDER_COLUMNS)
+
+# Fields not copied when cloning an order
+_CLONE_EXCLUDE = frozenset({"id", "parent_id", "timestamp"})
+
+
+def _get_upsert_sql(sqlite_version: Tuple[int, ...]) -> str:
+    """
+    Get the statement to insert or update an order
+    sqlite_version
+        version of the sqlite library as a tuple
+    Note
+    ----
+    1) upsert with on conflict requires SQLite 3.24 or later
+    2) older versions replace the entire row; this gives the same
+    result since all the columns of the orders table are updated
+    """
+    columns = ", ".join(_ORDER_COLUMNS)
+    values = ", ".join("?" for col in _ORDER_COLUMNS)
+    if sqlite_version >= (3, 24, 0):
+        updates = ", ".join(
+            f"{col}=excluded.{col}" for col in _ORDER_COLUMNS if col != "id"
+        )
+        return f"insert into orders ({columns}) values ({values}) on conflict(id) do update set {updates}"
+    else:
+        return f"insert or replace into orders ({columns}) values ({values})"
+
+
+_ORDER_UPSERT_SQL = _get_upsert_sql(sqlite3.sqlite_version_info)
+
+
+# Number of ids generated from a single read of random bytes
+_ID_BATCH_SIZE = 256
+_ids: List[str] = []
+
+
+def _refill_ids() -> None:
+    """
+    Generate a batch of uuid4 hex strings from a single read of random bytes
+    """
+    buf = bytearray(os.urandom(16 * _ID_BATCH_SIZE))
+    # Set the version and variant bits of each uuid as uuid.uuid4 does
+    buf[6::16] = bytes(b & 0x0F | 0x40 for b in buf[6::16])
+    buf[8::16] = bytes(b & 0x3F | 0x80 for b in buf[8::16])
+    hexed = buf.hex()
+    _ids.extend(hexed[i : i + 32] for i in range(0, len(hexed), 32))
+
+
+if hasattr(os, "register_at_fork"):
+    # A forked child must not reuse the ids generated by the parent
+    os.register_at_fork(after_in_child=_ids.clear)
+
+
+def _next_id() -> str:
+    """
+    returns a random uuid4 as hex string
+    Note
+    ----
+    1) ids are generated in batches of _ID_BATCH_SIZE
+    2) list.pop is atomic so ids are not repeated across threads
+    """
+    while True:
+        try:
+            return _ids.pop()
+        except IndexError:
+            _refill_ids()
+
+
+# Start and end of the current day for each timezone
+_END_OF_DAY: Dict[Optional[str], Tuple[pendulum.DateTime, pendulum.DateTime]] = {}
+
+
+def _end_of_day(now: pendulum.DateTime, tz: Optional[str]) -> pendulum.DateTime:
+    """
+    returns the end of the day for the given time
+    now
+        current time in the given timezone
+    tz
+        timezone; the result is cached for each timezone till the day ends
+    """
+    day = _END_OF_DAY.get(tz)
+    if day is None or not (day[0] <= now <= day[1]):
+        day = _END_OF_DAY[tz] = (now.start_of("day"), now.end_of("day"))
+    return day[1]
+
 
 def get_option(spot: float, num: int = 0, step: float = 100.0) -> float:
     """
@@ -41,15 +187,53 @@ def get_option(spot: float, num: int = 0, step: float = 100.0) -> float:
     return v * (step + num)
 
 
+def _upsert_orders(connection: Database, rows: List[Tuple[Any, ...]]) -> None:
+    """
+    Insert or update the given rows in the orders table in a single transaction
+    connection
+        database connection
+    rows
+        list of rows as returned by Order._row_values
+    """
+    con = connection.conn
+    with con:
+        con.executemany(_ORDER_UPSERT_SQL, rows)
+
+
+def _save_orders(orders: Iterable) -> None:
+    """
+    Save the given orders with one transaction for each database connection
+    orders
+        iterable of orders; orders without a connection are skipped
+    """
+    rows: Dict[int, Tuple[Database, List[Tuple[Any, ...]]]] = {}
+    for order in orders:
+        con = order.connection
+        if con:
+            rows.setdefault(id(con), (con, []))[1].append(order._row_values())
+    for con, values in rows.values():
+        _upsert_orders(con, values)
+
+
 def create_db(dbname: str = ":memory:") -> Union[Database, None]:
     """
     Create a sqlite3 database for the orders and return the connection
     dbname
         name of the database
         default in-memory database
+    Note
+    ----
+    1) File databases are opened in WAL mode with synchronous set to NORMAL
+    so that each commit does not wait for a full fsync
     """
     try:
         con = sqlite3.connect(dbname)
+        if dbname not in (":memory:", ""):
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+        con.execute("PRAGMA busy_timeout=5000")
+        con.execute("PRAGMA temp_store=MEMORY")
+        con.execute("PRAGMA cache_size=-20000")
         with con:
             con.execute(
                 """create table orders
@@ -85,6 +269,8 @@ class Order(BaseModel):
         attributes to update when data received from broker
     _frozen_attrs
         attributes frozen; cannot be changed when modifying orders
+    _modify_keys
+        attributes always sent to the broker when modifying orders
     """
 
     symbol: str
@@ -126,7 +312,7 @@ class Order(BaseModel):
     is_multi: bool = False
     last_updated_at: Optional[pendulum.DateTime] = None
     _num_modifications: int = 0
-    _attrs: Tuple[str, ...] = (
+    _attrs: ClassVar[Tuple[str, ...]] = (
         "exchange_timestamp",
         "exchange_order_id",
         "status",
@@ -135,32 +321,83 @@ class Order(BaseModel):
         "disclosed_quantity",
         "average_price",
     )
-    _exclude_fields: Set[str] = {"connection"}
+    _exclude_fields: ClassVar[FrozenSet[str]] = frozenset({"connection"})
     _lock: Optional[OrderLock] = None
-    _frozen_attrs: Set[str] = {"symbol", "side"}
+    _frozen_attrs: ClassVar[FrozenSet[str]] = frozenset({"symbol", "side"})
+    _modify_keys: ClassVar[FrozenSet[str]] = frozenset(
+        {
+            "order_id",
+            "quantity",
+            "price",
+            "trigger_price",
+            "order_type",
+            "disclosed_quantity",
+        }
+    )
+    _version: int = 0
+    _side_lc: str = ""
+    _sign: int = 1
 
     class Config:
         underscore_attrs_are_private = True
         arbitrary_types_allowed = True
+        # Use the same order instance when used as a field in other models
+        copy_on_model_validation = "none"
 
     def __init__(self, **data) -> None:
         super().__init__(**data)
-        from omspy.base import Broker
+        self._set_defaults()
+
+    @classmethod
+    def construct_fast(cls, **data) -> "Order":
+        """
+        Create an order without validating the data
+        data
+            order fields as keyword arguments
+        Note
+        ----
+        1) Values are neither validated nor coerced; use this only
+        for data already validated such as orders created internally
+        2) Default values are set the same way as a validated order
+        """
+        order = cls.construct(**data)
+        order._set_defaults()
+        return order
 
+    def _set_defaults(self) -> None:
+        """
+        Set the default values that depend on other fields
+        """
         if not (self.id):
-            self.id = uuid.uuid4().hex
+            self.id = _next_id()
         tz = self.timezone
+        now = pendulum.now(tz=tz)
         if not (self.timestamp):
-            self.timestamp = pendulum.now(tz=tz)
+            self.timestamp = now
         self.pending_quantity = self.quantity
         if self.expires_in == 0:
-            self.expires_in = (
-                pendulum.today(tz=tz).end_of("day") - pendulum.now(tz=tz)
-            ).seconds
+            self.expires_in = (_end_of_day(now, tz) - now).seconds
         else:
             self.expires_in = abs(self.expires_in)
         if self._lock is None:
             self._lock = OrderLock()
+        self._update_side()
+
+    def _update_side(self) -> None:
+        """
+        Cache the lower case side and the sign of the order;
+        sign is -1 for sell orders and 1 otherwise
+        """
+        side = str(self.side).lower()
+        self._side_lc = side
+        self._sign = -1 if side == "sell" else 1
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name == "side":
+            self._update_side()
+        if name in _ORDER_STATE_FIELDS:
+            self._version += 1
 
     @validator("quantity", always=True, allow_reuse=True)
     def quantity_not_negative(cls, v):
@@ -203,21 +440,35 @@ class Order(BaseModel):
         else:
             return False
 
+    def time_to_expiry_at(self, now: pendulum.DateTime) -> int:
+        """
+        time to expiry in seconds at the given time
+        """
+        return max(0, self.expires_in - (now - self.timestamp).seconds)
+
+    def time_after_expiry_at(self, now: pendulum.DateTime) -> int:
+        """
+        time after expiry in seconds at the given time
+        """
+        return max(0, (now - self.timestamp).seconds - self.expires_in)
+
+    def has_expired_at(self, now: pendulum.DateTime) -> bool:
+        """
+        returns True if the order has expired at the given time
+        """
+        return True if self.time_to_expiry_at(now) == 0 else False
+
     @property
     def time_to_expiry(self) -> int:
-        now = pendulum.now(tz=self.timezone)
-        ts = self.timestamp
-        return max(0, self.expires_in - (now - ts).seconds)
+        return self.time_to_expiry_at(pendulum.now(tz=self.timezone))
 
     @property
     def time_after_expiry(self) -> int:
-        now = pendulum.now(tz=self.timezone)
-        ts = self.timestamp
-        return max(0, (now - ts).seconds - self.expires_in)
+        return self.time_after_expiry_at(pendulum.now(tz=self.timezone))
 
     @property
     def has_expired(self) -> bool:
-        return True if self.time_to_expiry == 0 else False
+        return self.has_expired_at(pendulum.now(tz=self.timezone))
 
     @property
     def has_parent(self) -> bool:
@@ -351,19 +602,11 @@ class Order(BaseModel):
             broker, attribute="attribs_to_copy_modify", attribs_to_copy=attribs_to_copy
         )
         args_to_add = dict()
-        keys = [
-            "order_id",
-            "quantity",
-            "price",
-            "trigger_price",
-            "order_type",
-            "disclosed_quantity",
-        ]
         for k, v in kwargs.items():
             if k not in self._frozen_attrs:
                 if hasattr(self, k):
                     setattr(self, k, v)
-                    if k not in keys:
+                    if k not in self._modify_keys:
                         args_to_add[k] = v
                 else:
                     other_args[k] = v
@@ -392,35 +635,72 @@ class Order(BaseModel):
                 f"Order not canceled since lock is modified till {self.lock.cancellation_lock_till}"
             )
             return
+        if self.order_id is not None:
+            broker.order_cancel(**self._cancel_args(broker, attribs_to_copy))
+
+    def _cancel_args(
+        self, broker: Any, attribs_to_copy: Optional[Set] = None
+    ) -> Dict[str, Any]:
+        """
+        Get the keyword arguments to cancel this order with the broker
+        """
         other_args = self._get_other_args_from_attribs(
             broker, attribute="attribs_to_copy_cancel", attribs_to_copy=attribs_to_copy
         )
-        if self.order_id is not None:
-            broker.order_cancel(order_id=self.order_id, **other_args)
+        return dict(order_id=self.order_id, **other_args)
+
+    def _row_values(self) -> Tuple[Any, ...]:
+        """
+        returns the values of the order to be saved in the database
+        in the order of the table columns
+        """
+        return tuple(jsonify_if_needed(v) for v in _get_order_values(self))
 
     def save_to_db(self) -> bool:
         """
         save or update the order to db
         """
         if self.connection:
-            values = self.dict(exclude=self._exclude_fields)
-            self.connection["orders"].upsert(values, pk="id")
+            _upsert_orders(self.connection, [self._row_values()])
             return True
         else:
             logging.info("No valid database connection")
             return False
 
-    def clone(self):
+    def clone(self, **kwargs) -> "Order":
         """
         Clone the order with a new order id
+        kwargs
+            fields to be changed in the cloned order
         Note
         ----
-        returns a copy of the new order with a new
+        1) returns a copy of the new order with a new
         order_id. parent_id is not copied
+        2) fields are copied from this order which is already validated,
+        so they are not validated again; keyword arguments are validated
+        and unknown keyword arguments are ignored
+        3) containers such as the parsed JSON are copied so that
+        the clone does not share them with this order
         """
-        dct = self.dict(exclude={"id", "parent_id", "timestamp"})
-        order = Order(**dct)
-        return order
+        fields = Order.__fields__
+        dct = {
+            k: deepcopy(v) if isinstance(v, (dict, list, set)) else v
+            for k, v in self.__dict__.items()
+            if k in fields and k not in _CLONE_EXCLUDE
+        }
+        errors = []
+        for k, v in kwargs.items():
+            field = fields.get(k)
+            if field is None:
+                continue
+            value, error = field.validate(v, dct, loc=k, cls=Order)
+            if error:
+                errors.append(error)
+            else:
+                dct[k] = value
+        if errors:
+            raise ValidationError(errors, Order)
+        return Order.construct_fast(**dct)
 
     def add_lock(self, code: int, seconds: float):
         """
@@ -456,6 +736,11 @@ class CompoundOrder(BaseModel):
     order_args: Optional[Dict] = None
     _index: Dict[int, Order] = PrivateAttr(default_factory=defaultdict)
     _keys: Dict[Hashable, Order] = PrivateAttr(default_factory=defaultdict)
+    _pending: Optional[List[Order]] = PrivateAttr(default=None)
+    _completed: Optional[List[Order]] = PrivateAttr(default=None)
+    _cache_key: Optional[List[Tuple[Order, int]]] = PrivateAttr(default=None)
+    _aggregates: Optional[Dict[str, List[float]]] = PrivateAttr(default=None)
+    _aggregates_key: Optional[List[Tuple[Order, int]]] = PrivateAttr(default=None)
 
     class Config:
         underscore_attrs_are_private = True
@@ -464,13 +749,46 @@ class CompoundOrder(BaseModel):
     def __init__(self, **data) -> None:
         super().__init__(**data)
         if not (self.id):
-            self.id = uuid.uuid4().hex
+            self.id = _next_id()
         if self.order_args is None:
             self.order_args = {}
         if self.orders:
             for i, o in enumerate(self.orders):
                 self._index[i] = o
 
+    def _update_cache(self) -> None:
+        """
+        Partition orders into pending and completed orders
+        """
+        self._pending = [order for order in self.orders if order.is_pending]
+        self._completed = [order for order in self.orders if order.is_complete]
+        self._cache_key = self._state_key()
+
+    def _state_key(self) -> List[Tuple[Order, int]]:
+        """
+        returns each order along with its state version
+        """
+        return [(order, order._version) for order in self.orders]
+
+    def _is_current(self, key: Optional[List[Tuple[Order, int]]]) -> bool:
+        """
+        returns True if the key matches the current orders
+        Note
+        ----
+        1) a key is current only if the orders are the same objects
+        in the same positions and none of them changed state since
+        """
+        orders = self.orders
+        if key is None or len(key) != len(orders):
+            return False
+        for (order, version), current in zip(key, orders):
+            if order is not current or version != current._version:
+                return False
+        return True
+
+    def _is_cache_valid(self) -> bool:
+        return self._is_current(self._cache_key)
+
     @property
     def count(self) -> int:
         """
@@ -478,20 +796,44 @@ class CompoundOrder(BaseModel):
         """
         return len(self.orders)
 
+    def _aggregate(self) -> Dict[str, List[Optional[float]]]:
+        """
+        Aggregate the filled quantities and value by symbol
+        in a single pass over the orders
+        returns a dictionary with symbol as key and
+        [quantity, value, buy quantity, sell quantity] as value
+        Note
+        ----
+        1) quantity and value are signed; negative for sell orders
+        2) buy and sell quantity are None if the symbol has no orders on that side
+        3) The result is cached till an order changes or the orders change
+        """
+        if self._is_current(self._aggregates_key):
+            return self._aggregates
+        dct: Dict[str, List[Optional[float]]] = {}
+        for order in self.orders:
+            row = dct.get(order.symbol)
+            if row is None:
+                row = dct[order.symbol] = [0, 0, None, None]
+            filled = order.filled_quantity
+            quantity = filled * order._sign
+            row[0] += quantity
+            row[1] += quantity * order.average_price
+            side = order._side_lc
+            if side == "buy":
+                row[2] = (row[2] or 0) + abs(filled)
+            elif side == "sell":
+                row[3] = (row[3] or 0) + abs(filled)
+        self._aggregates = dct
+        self._aggregates_key = self._state_key()
+        return dct
+
     @property
     def positions(self) -> Counter:
         """
         return the positions as a dictionary
         """
-        c: Counter = Counter()
-        for order in self.orders:
-            symbol = order.symbol
-            qty = order.filled_quantity
-            side = str(order.side).lower()
-            sign = -1 if side == "sell" else 1
-            qty = qty * sign
-            c.update({symbol: qty})
-        return c
+        return Counter({symbol: row[0] for symbol, row in self._aggregate().items()})
 
     def _get_next_index(self) -> int:
         idx = max(self._index.keys()) + 1 if self._index else 0
@@ -527,7 +869,13 @@ class CompoundOrder(BaseModel):
         else:
             return order
 
-    def add_order(self, **kwargs) -> Optional[str]:
+    def _add_order(self, validate: bool = True, **kwargs) -> Order:
+        """
+        Create an order from the keyword arguments and add it
+        without saving it to the database
+        validate
+            if False, the order is created without validation
+        """
         kwargs["parent_id"] = self.id
         index = kwargs.pop("index", self._get_next_index())
         key = kwargs.pop("key", None)
@@ -538,14 +886,43 @@ class CompoundOrder(BaseModel):
         if key:
             if key in self._keys:
                 raise KeyError("Order already assigned to this key")
-        order = Order(**kwargs)
+        order = Order(**kwargs) if validate else Order.construct_fast(**kwargs)
         self.orders.append(order)
         self._index[index] = order
         if key:
             self._keys[key] = order
+        return order
+
+    def add_order(self, **kwargs) -> Optional[str]:
+        order = self._add_order(**kwargs)
         order.save_to_db()
         return order.id
 
+    def add_orders(
+        self, orders: List[Dict[str, Any]], validate: bool = True
+    ) -> List[str]:
+        """
+        Add multiple orders and save them to the database in a batch
+        orders
+            list of keyword arguments; one dictionary for each order
+        validate
+            if False, orders are created without validation
+        returns the list of order ids
+        Note
+        ----
+        1) Each dictionary takes the same arguments as add_order
+        2) Orders are saved in a single transaction per database connection
+        instead of a commit for each order
+        3) Set validate to False only for trusted data
+        """
+        added: List[Order] = []
+        try:
+            for kwargs in orders:
+                added.append(self._add_order(validate=validate, **kwargs))
+        finally:
+            _save_orders(added)
+        return [order.id for order in added]
+
     def _average_price(self, side: str = "buy") -> Dict[str, float]:
         """
         Get the average price for all the instruments
@@ -553,21 +930,17 @@ class CompoundOrder(BaseModel):
             side to calculate average price - buy or sel
         """
         side = str(side).lower()
-        value_counter: Counter = Counter()
-        quantity_counter: Counter = Counter()
+        values: Dict[str, float] = {}
+        quantities: Dict[str, float] = {}
         for order in self.orders:
-            order_side = str(order.side).lower()
-            if side == order_side:
+            if side == order._side_lc:
                 symbol = order.symbol
-                price = order.average_price
                 quantity = order.filled_quantity
-                value = price * quantity
-                value_counter.update({symbol: value})
-                quantity_counter.update({symbol: quantity})
+                values[symbol] = values.get(symbol, 0) + order.average_price * quantity
+                quantities[symbol] = quantities.get(symbol, 0) + quantity
         dct: defaultdict = defaultdict()
-        for v in value_counter:
-            numerator = value_counter.get(v)
-            denominator = quantity_counter.get(v)
+        for v, numerator in values.items():
+            denominator = quantities[v]
             if numerator and denominator:
                 dct[v] = numerator / denominator
         return dct
@@ -586,45 +959,49 @@ class CompoundOrder(BaseModel):
         data
             data as dictionary with key as broker order_id
         returns a dictionary with order_id and update status as boolean
+        Note
+        ----
+        1) All updated orders are saved together in a single transaction
         """
         dct: Dict[str, bool] = {}
+        updated: List[Order] = []
         for order in self.pending_orders:
             order_id = str(order.order_id)
-            status = order.status
             if order_id in data:
                 d = data.get(order_id)
                 if d:
-                    order.update(d)
+                    order.update(d, save=False)
+                    updated.append(order)
                     dct[order_id] = True
                 else:
                     dct[order_id] = False
             else:
                 dct[order_id] = False
+        _save_orders(updated)
         return dct
 
+    def _side_quantity(self, index: int) -> Counter:
+        return Counter(
+            {
+                symbol: row[index]
+                for symbol, row in self._aggregate().items()
+                if row[index] is not None
+            }
+        )
+
     def _total_quantity(self) -> Dict[str, Counter]:
         """
         Get the total buy and sell quantity by symbol
         """
-        buy_counter: Counter = Counter()
-        sell_counter: Counter = Counter()
-        for order in self.orders:
-            side = order.side.lower()
-            symbol = order.symbol
-            quantity = abs(order.filled_quantity)
-            if side == "buy":
-                buy_counter.update({symbol: quantity})
-            elif side == "sell":
-                sell_counter.update({symbol: quantity})
-        return {"buy": buy_counter, "sell": sell_counter}
+        return {"buy": self._side_quantity(2), "sell": self._side_quantity(3)}
 
     @property
     def buy_quantity(self) -> Counter:
-        return self._total_quantity()["buy"]
+        return self._side_quantity(2)
 
     @property
     def sell_quantity(self) -> Counter:
-        return self._total_quantity()["sell"]
+        return self._side_quantity(3)
 
     def update_ltp(self, last_price: Dict[str, float]):
         """
@@ -646,44 +1023,43 @@ class CompoundOrder(BaseModel):
         """
         Return the net value by symbol
         """
-        c: Counter = Counter()
-        for order in self.orders:
-            symbol = order.symbol
-            side = str(order.side).lower()
-            sign = -1 if side == "sell" else 1
-            value = order.filled_quantity * order.average_price * sign
-            c.update({symbol: value})
-        return c
+        return Counter({symbol: row[1] for symbol, row in self._aggregate().items()})
 
     @property
     def mtm(self) -> Counter:
-        c: Counter = Counter()
-        net_value = self.net_value
-        positions = self.positions
+        """
+        Return the mark to market value by symbol
+        Note
+        ----
+        1) positions and net value are taken from the cached aggregates
+        """
         ltp = self.ltp
-        for symbol, value in net_value.items():
-            c.update({symbol: -value})
-        for symbol, quantity in positions.items():
-            v = quantity * ltp.get(symbol, 0)
-            c.update({symbol: v})
-        return c
+        return Counter(
+            {
+                symbol: row[0] * ltp.get(symbol, 0) - row[1]
+                for symbol, row in self._aggregate().items()
+            }
+        )
 
     @property
     def total_mtm(self) -> float:
         return sum(self.mtm.values())
 
     def execute_all(self, **kwargs):
+        order_args = {**self.order_args, **kwargs}
         for order in self.orders:
-            order_args = deepcopy(self.order_args)
-            order_args.update(kwargs)
             order.execute(broker=self.broker, **order_args)
 
     def check_flags(self) -> None:
         """
         Check for flags on each order and take suitable action
+        Note
+        ----
+        1) Current time is taken once and used for all the orders
         """
-        for order in self.orders:
-            if (order.is_pending) and (order.has_expired):
+        now = pendulum.now()
+        for order in self.pending_orders:
+            if order.has_expired_at(now):
                 if order.convert_to_market_after_expiry:
                     order.order_type = "MARKET"
                     order.modify(self.broker)
@@ -692,11 +1068,15 @@ class CompoundOrder(BaseModel):
 
     @property
     def completed_orders(self) -> List[Order]:
-        return [order for order in self.orders if order.is_complete]
+        if not (self._is_cache_valid()):
+            self._update_cache()
+        return list(self._completed)
 
     @property
     def pending_orders(self) -> List[Order]:
-        return [order for order in self.orders if order.is_pending]
+        if not (self._is_cache_valid()):
+            self._update_cache()
+        return list(self._pending)
 
     def add(
         self, order: Order, index: Optional[int] = None, key: Optional[Hashable] = None
@@ -708,7 +1088,7 @@ class CompoundOrder(BaseModel):
         if not (order.connection):
             order.connection = self.connection
         if not (order.id):
-            order.id = uuid.uuid4().hex
+            order.id = _next_id()
         if index is None:
             index = self._get_next_index()
         index = int(index)
@@ -743,6 +1123,8 @@ class OrderStrategy(BaseModel):
     id: Optional[str] = None
     ltp: defaultdict = Field(default_factory=defaultdict)
     orders: List[CompoundOrder] = Field(default_factory=list)
+    _runnable: List[CompoundOrder] = PrivateAttr(default_factory=list)
+    _runnable_orders: List[CompoundOrder] = PrivateAttr(default_factory=list)
 
     class Config:
         underscore_attrs_are_private = True
@@ -751,15 +1133,39 @@ class OrderStrategy(BaseModel):
     def __init__(self, **data) -> None:
         super().__init__(**data)
         if not (self.id):
-            self.id = uuid.uuid4().hex
+            self.id = _next_id()
+        self._update_runnable()
+
+    def _update_runnable(self) -> None:
+        """
+        Cache the compound orders that have a callable run method
+        """
+        self._runnable = [
+            order for order in self.orders if callable(getattr(order, "run", None))
+        ]
+        self._runnable_orders = list(self.orders)
+
+    def _is_runnable_current(self) -> bool:
+        """
+        returns True if the orders are the same objects in the
+        same positions as when the runnable orders were cached
+        """
+        orders = self.orders
+        cached = self._runnable_orders
+        if len(cached) != len(orders):
+            return False
+        for order, current in zip(cached, orders):
+            if order is not current:
+                return False
+        return True
 
     @property
     def positions(self) -> Counter:
-        c: Counter = Counter()
+        dct: Dict[str, float] = {}
         for order in self.orders:
-            pos = order.positions
-            c.update(pos)
-        return c
+            for symbol, quantity in order.positions.items():
+                dct[symbol] = dct.get(symbol, 0) + quantity
+        return Counter(dct)
 
     def update_ltp(self, last_price: Dict[str, float]):
         for symbol, ltp in last_price.items():
@@ -779,28 +1185,53 @@ class OrderStrategy(BaseModel):
 
     @property
     def mtm(self) -> Counter:
-        c: Counter = Counter()
+        dct: Dict[str, float] = {}
         for order in self.orders:
-            mtm = order.mtm
-            c.update(mtm)
-        return c
+            for symbol, value in order.mtm.items():
+                dct[symbol] = dct.get(symbol, 0) + value
+        return Counter(dct)
 
     def run(self, ltp: Dict[str, float]) -> None:
         """
         Run all orders with the given data
         ltp
             last price data as a dictionary
+        Note
+        ----
+        1) Runnable orders are cached and the cache is rebuilt only
+        when the orders change
         """
-        for order in self.orders:
-            if hasattr(order, "run"):
-                if callable(getattr(order, "run")):
-                    order.run(ltp)
+        if not (self._is_runnable_current()):
+            self._update_runnable()
+        for order in self._runnable:
+            order.run(ltp)
+
+    async def arun(self, ltp: Dict[str, float]) -> None:
+        """
+        Run all orders with the given data from an event loop
+        ltp
+            last price data as a dictionary
+        Note
+        ----
+        1) orders are run one after another in the event loop thread
+        since orders and their database connection are not thread safe
+        2) control is given back to the event loop after each order
+        so that other tasks are not blocked till all the orders are run
+        """
+        if not (self._is_runnable_current()):
+            self._update_runnable()
+        for order in self._runnable:
+            order.run(ltp)
+            await asyncio.sleep(0)
 
     def add(self, order: CompoundOrder) -> None:
         """
         Add a compound order to the existing strategy
         """
         self.orders.append(order)
+        if callable(getattr(order, "run", None)):
+            self._runnable.append(order)
+        self._runnable_orders.append(order)
 
     def save(self) -> None:
         """
@@ -1,6 +1,7 @@
 from omspy.models import Quote
 from omspy.utils import tick
 from typing import List
+from operator import attrgetter
 from pydantic import BaseModel
 
 
@@ -12,9 +13,8 @@ class MarketDepth(BaseModel):
     @property
     def midpoint(self) -> float:
         a, b = self.bids[0].price, self.asks[0].price
-        mp = abs(b - a) / 2
-        tck = tick(min(a, b) + mp, 0.15)
-        return round(tick(min(a, b) + mp, tick_size=self.tick), 2)
+        mp = min(a, b) + abs(b - a) / 2
+        return round(tick(mp, tick_size=self.tick), 2)
 
     def bid(self, n: int = 0) -> float:
         """
@@ -33,5 +33,6 @@ class MarketDepth(BaseModel):
         Sort asks and bids based on price
         sorting is done in place replacing asks and bids
         """
-        self.bids.sort(key=lambda x: x.price, reverse=True)
-        self.asks.sort(key=lambda x: x.price)
+        key = attrgetter("price")
+        self.bids.sort(key=key, reverse=True)
+        self.asks.sort(key=key)
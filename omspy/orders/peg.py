@@ -3,8 +3,17 @@ from omspy.base import Broker
 from omspy.order import Order, CompoundOrder
 from omspy.models import OrderLock
 import pendulum
-from pydantic import BaseModel, ValidationError, validator
+from pydantic import BaseModel, ValidationError, validator, root_validator
 import logging
+import asyncio
+
+# Order status after which subsequent orders in a sequence are canceled
+_FAILED_STATUSES = frozenset({"CANCELED", "CANCELLED", "REJECTED"})
+
+# Peg attributes not passed on to the order created by BasicPeg
+_BASIC_PEG_ATTRIBS = frozenset(
+    {"symbol", "side", "quantity", "timezone", "order_type", "connection"}
+)
 
 
 class BasicPeg(CompoundOrder):
@@ -15,24 +24,14 @@ class BasicPeg(CompoundOrder):
 
     def __init__(self, **data) -> None:
         super().__init__(**data)
-        pop_attribs = [
-            "symbol",
-            "side",
-            "quantity",
-            "timezone",
-            "order_type",
-            "connection",
-        ]
-        for attrib in pop_attribs:
-            if attrib in data:
-                data.pop(attrib)
+        data = {k: v for k, v in data.items() if k not in _BASIC_PEG_ATTRIBS}
         order = Order(
             symbol=self.symbol,
             quantity=self.quantity,
             side=self.side,
             timezone=self.timezone,
             order_type="LIMIT",
-            **data
+            **data,
         )
         self.add(order)
         self.ltp[self.symbol] = 0
@@ -51,8 +50,9 @@ class PegMarket(BasicPeg):
         super().__init__(**data)
         self._max_pegs = int(self.duration / self.peg_every)
         self._num_pegs = 0
-        self._expire_at = pendulum.now(tz=self.timezone).add(seconds=self.duration)
-        self._next_peg = pendulum.now(tz=self.timezone).add(seconds=self.peg_every)
+        now = pendulum.now(tz=self.timezone)
+        self._expire_at = now.add(seconds=self.duration)
+        self._next_peg = now.add(seconds=self.peg_every)
 
     def execute(self):
         self.orders[0].price = self.ref_price
@@ -70,18 +70,38 @@ class PegMarket(BasicPeg):
     def ref_price(self):
         return self.ltp.get(self.symbol)
 
-    def run(self):
+    @property
+    def next_deadline(self) -> pendulum.DateTime:
+        """
+        The earliest time at which run could act on the order;
+        calling run before this time does nothing
+        """
+        return min(self._next_peg, self._expire_at)
+
+    def run(self, ltp: Optional[Dict[str, float]] = None):
+        """
+        Peg the order to the last price
+        ltp
+            last price as a dictionary; updated before pegging
+        Note
+        ----
+        1) ltp is optional so that the order could be run from a strategy
+        or by itself after updating the last price
+        """
+        if ltp:
+            self.update_ltp(ltp)
         order = self.orders[0]
+        if not order.is_pending:
+            return
         now = pendulum.now(self.timezone)
-        if order.is_pending:
-            if now > self.next_peg:
-                self._next_peg = now.add(seconds=self.peg_every)
-                order.modify(broker=self.broker, price=self.ref_price)
-            if now > self._expire_at:
-                if self.convert_to_market_after_expiry:
-                    order.modify(broker=self.broker, order_type="MARKET")
-                else:
-                    order.cancel(self.broker)
+        if now > self._next_peg:
+            self._next_peg = now.add(seconds=self.peg_every)
+            order.modify(broker=self.broker, price=self.ltp.get(self.symbol))
+        if now > self._expire_at:
+            if self.convert_to_market_after_expiry:
+                order.modify(broker=self.broker, order_type="MARKET")
+            else:
+                order.cancel(self.broker)
 
 
 class PegExisting(BaseModel):
@@ -106,8 +126,9 @@ class PegExisting(BaseModel):
         super().__init__(**data)
         self._max_pegs = int(self.duration / self.peg_every)
         self._num_pegs = 0
-        self._expire_at = pendulum.now(tz=self.timezone).add(seconds=self.duration)
-        self._next_peg = pendulum.now(tz=self.timezone).add(seconds=self.peg_every)
+        now = pendulum.now(tz=self.timezone)
+        self._expire_at = now.add(seconds=self.duration)
+        self._next_peg = now.add(seconds=self.peg_every)
         self.order.order_type = "LIMIT"
         self.order.trigger_price = 0
         if self.order_args is None:
@@ -133,6 +154,14 @@ class PegExisting(BaseModel):
     def num_pegs(self) -> int:
         return self._num_pegs
 
+    @property
+    def next_deadline(self) -> pendulum.DateTime:
+        """
+        The earliest time at which run could act on the order;
+        calling run before this time does nothing
+        """
+        return min(self._next_peg, self._expire_at)
+
     def execute(self) -> None:
         self.order.execute(broker=self.broker, **self.order_args)
 
@@ -143,6 +172,19 @@ class PegExisting(BaseModel):
         if self.order.is_done:
             self.done = True
 
+    async def arun(self, ltp: float) -> None:
+        """
+        Run the peg from an event loop
+        Note
+        ----
+        1) run is called in the event loop thread since orders and
+        their database connection are not thread safe
+        2) control is given back to the event loop after the run so
+        that multiple pegs run with asyncio.gather take turns
+        """
+        self.run(ltp)
+        await asyncio.sleep(0)
+
     def run(self, ltp: float) -> None:
         if self.done:
             logging.warning("Order already done")
@@ -150,21 +192,21 @@ class PegExisting(BaseModel):
 
         self._mark_done()
         order = self.order
+        if not (order.is_pending):
+            return
         now = pendulum.now(self.timezone)
-        if order.is_pending:
-            if now > self._expire_at:
-                if self.order.convert_to_market_after_expiry:
-                    order.modify(
-                        broker=self.broker, order_type="MARKET", **self.modify_args
-                    )
-                    order.add_lock(1, self.lock_duration)
-                else:
-                    order.cancel(self.broker)
-                    order.add_lock(2, self.lock_duration)
-            elif now > self.next_peg:
-                self._next_peg = now.add(seconds=self.peg_every)
-                order.modify(broker=self.broker, price=ltp, **self.modify_args)
+        broker = self.broker
+        if now > self._expire_at:
+            if order.convert_to_market_after_expiry:
+                order.modify(broker=broker, order_type="MARKET", **self.modify_args)
                 order.add_lock(1, self.lock_duration)
+            else:
+                order.cancel(broker)
+                order.add_lock(2, self.lock_duration)
+        elif now > self._next_peg:
+            self._next_peg = now.add(seconds=self.peg_every)
+            order.modify(broker=broker, price=ltp, **self.modify_args)
+            order.add_lock(1, self.lock_duration)
 
 
 class PegSequential(BaseModel):
@@ -176,6 +218,8 @@ class PegSequential(BaseModel):
     force_order_type
         if True, all orders are forced as LIMIT order
         if False, non LIMIT orders are placed as is without order type and other arguments being changed
+    stop_after_expiry
+        if True, run_after_expiry is called only once after the entire sequence has expired and no further orders are pegged
     """
 
     orders: List[Order]
@@ -190,8 +234,14 @@ class PegSequential(BaseModel):
     modify_args: Optional[Dict[str, str]] = None
     skip_subsequent_if_failed = False
     force_order_type = True
+    stop_after_expiry = False
     _order: Optional[Union[Order, PegExisting]] = None
     _start_time: Optional[pendulum.DateTime] = None
+    _expire_at: Optional[pendulum.DateTime] = None
+    _expire_total: int = 0
+    _current_index: int = 0
+    _skipped: List[Tuple[Order, int]] = []
+    _expiry_handled: bool = False
 
     class Config:
         underscore_attrs_are_private = True
@@ -202,20 +252,25 @@ class PegSequential(BaseModel):
             self.order_args = {}
         if self.modify_args is None:
             self.modify_args = {}
-        # Validate whether orders could be pegged
+        # Orders to be pegged are placed as LIMIT orders
         for order in self.orders:
             if (self.force_order_type) or (order.order_type == "LIMIT"):
-                peg = PegExisting(
-                    order=order,
-                    timezone=self.timezone,
-                    duration=self.duration,
-                    peg_every=self.peg_every,
-                    lock_duration=self.lock_duration,
-                    order_args=self.order_args,
-                    modify_args=self.modify_args,
-                )
+                order.order_type = "LIMIT"
+                order.trigger_price = 0
         self._start_time = pendulum.now(tz=self.timezone)
 
+    @root_validator(skip_on_failure=True)
+    def orders_should_be_pending(cls, values):
+        """
+        Only accept pending orders for those orders to be pegged
+        """
+        force_order_type = values.get("force_order_type")
+        for order in values.get("orders", []):
+            if force_order_type or (order.order_type == "LIMIT"):
+                if not (order.is_pending):
+                    raise ValueError(f"Order {order.id} is not pending")
+        return values
+
     @property
     def has_expired(self) -> bool:
         """
@@ -226,13 +281,48 @@ class PegSequential(BaseModel):
         Note
         ----
         1) total_time = duration*number of orders
+        2) expiry time is cached and computed again only
+        when the total time changes
         """
-        total_time = self.duration * len(self.orders)
-        if pendulum.now(tz=self.timezone) > self._start_time.add(seconds=total_time):
+        if pendulum.now(tz=self.timezone) > self.expire_at:
             return True
         else:
             return False
 
+    @property
+    def expire_at(self) -> pendulum.DateTime:
+        """
+        Time at which the entire sequential order expires
+        """
+        total_time = self.duration * len(self.orders)
+        if self._expire_at is None or self._expire_total != total_time:
+            self._expire_at = self._start_time.add(seconds=total_time)
+            self._expire_total = total_time
+        return self._expire_at
+
+    @property
+    def next_deadline(self) -> pendulum.DateTime:
+        """
+        The earliest time at which run could act on the orders
+        Note
+        ----
+        1) this is the earlier of the next deadline of the current
+        peg order and the expiry of the sequence
+        2) the current time is returned if the current order is yet
+        to be placed or is done, since run acts on it immediately
+        3) a completed order moves the sequence to the next order,
+        so run should also be called on order updates
+        """
+        if self.done:
+            return self.expire_at
+        order = self.order
+        current = order.order if isinstance(order, PegExisting) else order
+        if current is None or current.is_done or not (current.order_id):
+            return pendulum.now(tz=self.timezone)
+        if isinstance(order, PegExisting):
+            return min(order.next_deadline, self.expire_at)
+        return self.expire_at
+
     @property
     def order(self) -> Optional[Union[Order, PegExisting]]:
         return self._order
@@ -256,28 +346,46 @@ class PegSequential(BaseModel):
         """
         Whether all orders are completed
         """
-        return all([order.is_complete for order in self.orders])
+        return all(order.is_complete for order in self.orders)
 
     def get_current_order(self) -> Union[PegExisting, None]:
         """
         Get the current order to peg
+        Note
+        ----
+        1) Orders are searched from the last pending order; orders skipped
+        earlier are searched again if any of them changed state or the
+        orders are replaced or reordered
         """
-        for order in self.orders:
-            if order.is_pending:
-                if self.force_order_type or (order.order_type == "LIMIT"):
-                    return PegExisting(
-                        order=order,
-                        broker=self.broker,
-                        timezone=self.timezone,
-                        duration=self.duration,
-                        peg_every=self.peg_every,
-                        lock_duration=self.lock_duration,
-                        order_args=self.order_args,
-                        modify_args=self.modify_args,
-                    )
-                else:
-                    return order
-        return None
+        orders = self.orders
+        skipped = self._skipped
+        if len(skipped) > len(orders) or any(
+            order is not current or version != current._version
+            for (order, version), current in zip(skipped, orders)
+        ):
+            skipped = []
+        index = len(skipped)
+        while index < len(orders) and not (orders[index].is_pending):
+            skipped.append((orders[index], orders[index]._version))
+            index += 1
+        self._skipped = skipped
+        self._current_index = index
+        if index == len(orders):
+            return None
+        order = orders[index]
+        if self.force_order_type or (order.order_type == "LIMIT"):
+            return PegExisting(
+                order=order,
+                broker=self.broker,
+                timezone=self.timezone,
+                duration=self.duration,
+                peg_every=self.peg_every,
+                lock_duration=self.lock_duration,
+                order_args=self.order_args,
+                modify_args=self.modify_args,
+            )
+        else:
+            return order
 
     def set_current_order(self) -> Union[PegExisting, None]:
         """
@@ -321,36 +429,79 @@ class PegSequential(BaseModel):
             order.order_type = "MARKET"
             order.modify(broker=self.broker)
 
-    def run_after_expiry(self) -> None:
+    def run_after_expiry(self) -> Optional[bool]:
         """
         Run this function after the overall peg time has expired.
         This function could be overriden to match customized functionality
+        returns False if any order could not be canceled
+        Note
+        ----
+        1) If the broker implements order_cancel_batch, orders to be canceled
+        are canceled in a single call with the same arguments as Order.cancel
+        2) Order status is not changed for the canceled orders; it is
+        updated from the broker
         """
         if self.done:
-            return
+            return None
+        batch = callable(getattr(type(self.broker), "order_cancel_batch", None))
+        to_cancel: List[Order] = []
         for order in self.orders:
             if order.is_pending:
-                self._process_order_after_expiry(order)
+                if batch and order.order_id and order.cancel_after_expiry:
+                    if order.lock.can_cancel:
+                        to_cancel.append(order)
+                else:
+                    self._process_order_after_expiry(order)
+        if to_cancel:
+            responses = self.broker.order_cancel_batch(
+                orders=[order._cancel_args(self.broker) for order in to_cancel]
+            )
+            failed = [
+                order
+                for order, response in zip(to_cancel, responses or [])
+                if isinstance(response, Exception)
+            ]
+            for order in failed:
+                logging.warning(f"Order {order.order_id} not canceled after expiry")
+            return not (failed)
+        return True
 
     def _mark_subsequent_orders_as_canceled(self) -> None:
         """
         Mark all subsequent orders as canceled if the
         existing order status is canceled or rejected
         """
-        index = 0
-        flag = False
-        for i, order in enumerate(self.orders):
-            if order.status in ("CANCELED", "CANCELLED", "REJECTED"):
-                index = i
-                flag = True
-                break
-        if flag and (index < len(self.orders) - 1):
-            for i in range(index + 1, len(self.orders)):
-                self.orders[i].status = "CANCELED"
+        orders = self.orders
+        for i, order in enumerate(orders):
+            if order.status in _FAILED_STATUSES:
+                for subsequent in orders[i + 1 :]:
+                    subsequent.status = "CANCELED"
+                return
+
+    async def arun(self, ltp: Dict[str, float]) -> None:
+        """
+        Run the sequential peg from an event loop
+        Note
+        ----
+        1) run is called in the event loop thread since orders and
+        their database connection are not thread safe
+        2) control is given back to the event loop after the run so
+        that multiple pegs run with asyncio.gather take turns
+        """
+        self.run(ltp)
+        await asyncio.sleep(0)
 
     def run(self, ltp: Dict[str, float]) -> None:
         if self.done:
             return
+        if self.stop_after_expiry and self.has_expired:
+            # Orders are canceled only once; the broker may take
+            # some time to update their status
+            if not (self._expiry_handled):
+                # Try again on the next run if any cancellation failed
+                self._expiry_handled = self.run_after_expiry() is not False
+            self._mark_done()
+            return
         if self.skip_subsequent_if_failed:
             self._mark_subsequent_orders_as_canceled()
         self.set_current_order()
@@ -370,4 +521,5 @@ class PegSequential(BaseModel):
         self._mark_done()
 
     def _mark_done(self) -> None:
-        self.done = all([order.is_done for order in self.orders])
+        # Stops at the first order that is not done
+        self.done = all(order.is_done for order in self.orders)
@@ -4,6 +4,11 @@ from omspy.base import Broker
 from omspy.order import Order, CompoundOrder
 from pydantic import PrivateAttr
 
+# Side of the cover order for the given side
+_OPPOSITE_SIDE = {"buy": "sell", "sell": "buy"}
+# Sign of the given side used in price comparisons
+_SIDE_SIGN = {"buy": 1, "sell": -1}
+
 
 class StopOrder(CompoundOrder):
     symbol: str
@@ -12,30 +17,49 @@ class StopOrder(CompoundOrder):
     price: float = 0.0
     quantity: int = 1
     disclosed_quantity: int = 0
-    order_type: Optional[Tuple[str, str]] = None
+    order_type: Optional[Tuple[str, str]] = ("LIMIT", "SL-M")
+    _side_sign: int = PrivateAttr(default=0)
     # TODO: Add order lock on modify
 
     def __init__(self, **data):
         super().__init__(**data)
+        self._side_sign = _SIDE_SIGN.get(str(self.side).lower(), 0)
+        # order type could still be explicitly passed as None
         if self.order_type is None:
             self.order_type = ("LIMIT", "SL-M")
-        side_map = {"buy": "sell", "sell": "buy"}
-        base_order = Order(
+        base_order = dict(
             symbol=self.symbol,
             side=self.side,
             quantity=self.quantity,
             disclosed_quantity=self.disclosed_quantity,
             order_type=self.order_type[0],
             price=self.price,
-            trigger_price=0,
+            trigger_price=0.0,
+        )
+        cover_order = dict(
+            base_order,
+            side=_OPPOSITE_SIDE.get(str(self.side).lower()),
+            order_type=self.order_type[1],
+            trigger_price=self.trigger_price,
         )
+        # Fields are already validated by this model
+        self.add_orders([base_order, cover_order], validate=False)
 
-        cover_order = base_order.clone()
-        cover_order.trigger_price = self.trigger_price
-        cover_order.order_type = self.order_type[1]
-        cover_order.side = side_map.get(cover_order.side)
-        self.add(base_order)
-        self.add(cover_order)
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name == "side":
+            self._side_sign = _SIDE_SIGN.get(str(value).lower(), 0)
+
+    def _get_ltp(self, ltp: Union[float, Dict[str, float]]) -> Optional[float]:
+        """
+        Get the last price of the symbol
+        ltp
+            last price or a dictionary with symbol as key and last price as value
+        returns None if the symbol is not in the dictionary
+        """
+        if isinstance(ltp, dict):
+            return ltp.get(self.symbol)
+        return ltp
 
 
 class StopLimitOrder(StopOrder):
@@ -68,7 +92,7 @@ class TrailingStopOrder(StopOrder):
 
     @property
     def sign(self) -> int:
-        return 1 if self.side == "buy" else -1
+        return 1 if self._side_sign == 1 else -1
 
     def __init__(self, **data):
         super().__init__(**data)
@@ -89,28 +113,31 @@ class TrailingStopOrder(StopOrder):
     def next_trail(self) -> float:
         return self._next_trail
 
-    def run(self, ltp: float):
+    def run(self, ltp: Union[float, Dict[str, float]]):
         """
         Update trailing stop
+        Note
+        ----
+        1) if the last price jumps over more than one trail, the stop
+        loss is moved by all the trails at once
         """
-        if self.next_trail == 0:
+        ltp = self._get_ltp(ltp)
+        if ltp is None:
+            return
+        if self._next_trail == 0:
             self._update_next_trail()
-        if self.next_trail > 0:
-            if self.side == "buy":
-                if ltp > self.next_trail:
-                    # TODO: Trail to adjust to the nearest trail in case of jump in ltp
-                    self._stop_loss += self.trail_by
-                    self._next_trail += self.trail_by
-                    self.orders[-1].modify(
-                        broker=self.broker, trigger_price=self._stop_loss
-                    )
-            elif self.side == "sell":
-                if ltp < self.next_trail:
-                    self._stop_loss -= self.trail_by
-                    self._next_trail -= self.next_trail
-                    self.orders[-1].modify(
-                        broker=self.broker, trigger_price=self._stop_loss
-                    )
+        next_trail = self._next_trail
+        sign = self._side_sign
+        if next_trail > 0 and sign:
+            diff = (ltp - next_trail) * sign
+            if diff > 0:
+                # Trail to the nearest trail in case of a jump in ltp
+                step = -(-diff // self.trail_by) * self.trail_by * sign
+                self._stop_loss += step
+                self._next_trail += step
+                self.orders[-1].modify(
+                    broker=self.broker, trigger_price=self._stop_loss
+                )
 
 
 class TargetOrder(StopOrder):
@@ -129,15 +156,24 @@ class TargetOrder(StopOrder):
     def __init__(self, **data):
         super().__init__(**data)
 
-    def run(self, ltp: float):
+    def is_target_hit(self, ltp: float) -> bool:
+        """
+        returns True if the last price has reached the target
+        """
+        sign = self._side_sign
+        return bool(sign) and (ltp - self.target) * sign >= 0
+
+    def run(self, ltp: Union[float, Dict[str, float]]):
         """
         Update and exit if target is hit
+        ltp
+            last price or a dictionary with symbol as key and last price as value
         """
+        ltp = self._get_ltp(ltp)
+        if ltp is None:
+            return
+        if not (self.is_target_hit(ltp)):
+            return
         price = self.price if self.price > 0 else self.orders[0].average_price
         if price > 0:
-            if self.side == "buy":
-                if ltp >= self.target:
-                    self.orders[-1].modify(broker=self.broker, order_type="MARKET")
-            elif self.side == "sell":
-                if ltp <= self.target:
-                    self.orders[-1].modify(broker=self.broker, order_type="MARKET")
+            self.orders[-1].modify(broker=self.broker, order_type="MARKET")
@@ -4,15 +4,31 @@ All the models start with **V** to indicate virtual models
 """
 
 from pydantic import BaseModel, Field, validator, PrivateAttr
-from typing import Optional, Union, Any, Dict, List
+from typing import Optional, Union, Any, Dict, Iterable, List, Tuple
 from enum import Enum
 import random
 import uuid
 import pendulum
-import omspy.utils as utils
 from omspy.models import OrderBook
 
 
+# Fields on which the status of a virtual order depends
+_VORDER_STATUS_FIELDS = frozenset(
+    (
+        "quantity",
+        "filled_quantity",
+        "pending_quantity",
+        "canceled_quantity",
+        "status_message",
+    )
+)
+
+# Fields on which the average prices of a virtual position depend
+_VPOSITION_FIELDS = frozenset(
+    ("buy_quantity", "sell_quantity", "buy_value", "sell_value")
+)
+
+
 class Status(Enum):
     COMPLETE = 1
     REJECTED = 2
@@ -42,6 +58,11 @@ class OrderType(Enum):
     LIMIT = 2
 
 
+# Lookup tables used to convert strings to side and order type
+_SIDES = {"b": Side.BUY, "s": Side.SELL}
+_ORDER_TYPES = {"LIMIT": OrderType.LIMIT, "MARKET": OrderType.MARKET}
+
+
 class OHLC(BaseModel):
     open: float
     high: float
@@ -108,13 +129,39 @@ class Ticker(BaseModel):
         """
         Get the last price and update it
         """
-        if self.is_random:
-            diff = random.gauss(0, 1) * self._ltp * 0.01
-            last_price = self._ltp + diff
-            last_price = round(last_price * 20) / 20
-            self._update_values(last_price)
+        if self.mode == TickerMode.RANDOM:
+            ltp = self._ltp
+            last_price = round((ltp + random.gauss(0, 1) * ltp * 0.01) * 20) / 20
+            self._ltp = last_price
+            if last_price > self._high:
+                self._high = last_price
+            elif last_price < self._low:
+                self._low = last_price
         return self._ltp
 
+    def step_n(self, n: int) -> OHLC:
+        """
+        Advance the ticker by the given number of ticks
+        n
+            number of ticks
+        returns the ohlc after the last tick
+        Note
+        -----
+        1) This is the same as getting the ltp n times
+        2) Prices are not changed if the ticker mode is not random
+        """
+        if self.mode == TickerMode.RANDOM:
+            ltp, high, low = self._ltp, self._high, self._low
+            gauss = random.gauss
+            for _ in range(n):
+                ltp = round((ltp + gauss(0, 1) * ltp * 0.01) * 20) / 20
+                if ltp > high:
+                    high = ltp
+                elif ltp < low:
+                    low = ltp
+            self._ltp, self._high, self._low = ltp, high, low
+        return self.ohlc()
+
     def update(self, last_price: float) -> float:
         """
         Update last price,high and low
@@ -147,13 +194,22 @@ class VTrade(BaseModel):
     price: float
     side: Side
     timestamp: Optional[pendulum.DateTime]
+    _side_sign: Optional[int] = PrivateAttr(default=None)
 
     class Config:
         validate_assignment = True
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name == "side":
+            self._side_sign = None
+
     @property
     def value(self) -> float:
-        return self.side.value * self.quantity * self.price
+        sign = self._side_sign
+        if sign is None:
+            sign = self._side_sign = self.side.value
+        return sign * self.quantity * self.price
 
 
 class VOrder(BaseModel):
@@ -173,19 +229,32 @@ class VOrder(BaseModel):
     pending_quantity: float = 0
     canceled_quantity: float = 0
     _delay: int = PrivateAttr()
+    _status: Optional[Status] = PrivateAttr(default=None)
+    _is_done: bool = PrivateAttr(default=False)
+    _side_sign: Optional[int] = PrivateAttr(default=None)
+    _expiry: Optional[pendulum.DateTime] = PrivateAttr(default=None)
 
     class Config:
         validate_assignment = True
+        # Use the same order instance when used as a field in responses
+        copy_on_model_validation = "none"
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in _VORDER_STATUS_FIELDS:
+            self._update_status()
+        elif name in ("timestamp", "_delay"):
+            self._expiry = None
+        elif name == "side":
+            self._side_sign = None
 
     @validator("side", pre=True, always=True)
     def accept_buy_sell_as_side(cls, v):
         if isinstance(v, str):
-            if v.lower()[0] == "b":
-                return Side.BUY
-            elif v.lower()[0] == "s":
-                return Side.SELL
-            else:
+            side = _SIDES.get(v[:1].lower())
+            if side is None:
                 raise TypeError(f"{v} is not a valid side, should be buy or sell")
+            return side
         else:
             return v
 
@@ -196,14 +265,12 @@ class VOrder(BaseModel):
         should be market or limit
         """
         if isinstance(v, str):
-            if v.upper() == "LIMIT":
-                return OrderType.LIMIT
-            elif v.upper() == "MARKET":
-                return OrderType.MARKET
-            else:
+            order_type = _ORDER_TYPES.get(v.upper())
+            if order_type is None:
                 raise TypeError(
                     f"{v} is not a valid  order type, should be one of LIMIT/MARKET"
                 )
+            return order_type
         else:
             return v
 
@@ -211,21 +278,124 @@ class VOrder(BaseModel):
         """
         Make the pending, filled and canceled correct
         based on available data
-        """
-        q = utils.update_quantity(
-            q=self.quantity,
-            f=self.filled_quantity,
-            p=self.pending_quantity,
-            c=self.canceled_quantity,
+        Note
+        ----
+        1) this is the same logic as utils.update_quantity
+        inlined since it runs on every order creation
+        """
+        quantity = self.quantity
+        filled = self.filled_quantity
+        pending = self.pending_quantity
+        canceled = self.canceled_quantity
+        if canceled > 0:
+            canceled = min(canceled, quantity)
+            filled = quantity - canceled
+            pending = quantity - canceled - filled
+        elif filled > 0:
+            filled = min(filled, quantity)
+            pending = quantity - filled
+        elif pending > 0:
+            pending = min(pending, quantity)
+            filled = quantity - pending
+        else:
+            # A new order has the entire quantity pending
+            pending = quantity - pending
+        self._set_quantities(filled, pending, canceled)
+
+    def _set_fill(self, filled: float, average_price: float) -> None:
+        """
+        Set the filled quantity and average price without validation
+        Note
+        ----
+        1) used by the simulator on every fill; values must
+        already be numbers
+        """
+        values = self.__dict__
+        values["filled_quantity"] = filled
+        values["average_price"] = average_price
+        self.__fields_set__.update(("filled_quantity", "average_price"))
+        self._update_status()
+
+    def _set_quantities(self, filled: float, pending: float, canceled: float) -> None:
+        """
+        Set the filled, pending and canceled quantities at once
+        and update the status only once
+        """
+        values = self.__dict__
+        values["filled_quantity"] = filled
+        values["pending_quantity"] = pending
+        values["canceled_quantity"] = canceled
+        self.__fields_set__.update(
+            ("filled_quantity", "pending_quantity", "canceled_quantity")
         )
-        self.filled_quantity = q.f
-        self.pending_quantity = q.p
-        self.canceled_quantity = q.c
+        self._update_status()
 
     def __init__(self, **data):
+        # Timestamp is set before validation to avoid a validated assignment
+        if data.get("timestamp") is None:
+            data["timestamp"] = pendulum.now(tz="local")
         super().__init__(**data)
-        if self.timestamp is None:
-            self.timestamp = pendulum.now(tz="local")
+        self._set_defaults()
+
+    @classmethod
+    def construct_fast(cls, **data) -> "VOrder":
+        """
+        Create an order without validating the data
+        data
+            order fields as keyword arguments
+        Note
+        ----
+        1) Values are neither validated nor coerced; use this only
+        for data generated internally with the right types
+        2) Default values are set the same way as a validated order
+        """
+        if data.get("timestamp") is None:
+            data["timestamp"] = pendulum.now(tz="local")
+        order = cls.construct(**data)
+        order._set_defaults()
+        return order
+
+    @classmethod
+    def bulk_from_records(cls, records: Iterable[Dict[str, Any]]) -> List["VOrder"]:
+        """
+        Create orders from a list of records without full validation
+        records
+            list of dictionaries with order fields
+        Note
+        ----
+        1) side and order_type are converted the same way as a validated
+        order and quantity is converted to float; all other values must
+        already be of the right type
+        2) orders without a timestamp share the same timestamp
+        3) use this to replay a large number of orders into the simulator
+        4) ValueError is raised with the index of the first record
+        missing a required field
+        """
+        now = pendulum.now(tz="local")
+        side = cls.accept_buy_sell_as_side
+        order_type = cls.accept_order_type_as_str
+        required = [k for k, v in cls.__fields__.items() if v.required]
+        orders = []
+        for i, record in enumerate(records):
+            data = dict(record)
+            missing = [k for k in required if data.get(k) is None]
+            if missing:
+                raise ValueError(
+                    f"record {i} is missing required fields {', '.join(missing)}"
+                )
+            data["side"] = Side(side(data["side"]))
+            if "order_type" in data:
+                data["order_type"] = OrderType(order_type(data["order_type"]))
+            data["quantity"] = float(data["quantity"])
+            if data.get("timestamp") is None:
+                data["timestamp"] = now
+            orders.append(cls.construct_fast(**data))
+        return orders
+
+    def _set_defaults(self) -> None:
+        """
+        Set the default values that depend on other fields
+        """
         self._make_right_quantity()
         if self.average_price is None:
             self.average_price = 0
@@ -236,48 +406,56 @@ class VOrder(BaseModel):
         Modify an order quantity based on the given status
         """
         if status in (Status.CANCELED, Status.REJECTED):
-            self.filled_quantity = 0
-            self.pending_quantity = 0
-            self.canceled_quantity = self.quantity
+            self._set_quantities(0, 0, self.quantity)
         elif status == Status.OPEN:
-            self.filled_quantity = 0
-            self.pending_quantity = self.pending_quantity
-            self.canceled_quantity = 0
+            self._set_quantities(0, self.pending_quantity, 0)
         elif status == Status.PARTIAL_FILL:
             a = random.randrange(1, int(self.quantity))
             b = self.quantity - a
-            self.filled_quantity = a
-            self.pending_quantity = 0
-            self.canceled_quantity = b
+            self._set_quantities(a, 0, b)
         elif status == Status.PENDING:
             a = random.randrange(1, int(self.quantity))
             b = self.quantity - a
-            self.filled_quantity = a
-            self.pending_quantity = b
-            self.canceled_quantity = 0
+            self._set_quantities(a, b, 0)
         else:
-            self.filled_quantity = self.quantity
-            self.pending_quantity = 0
-            self.canceled_quantity = 0
+            self._set_quantities(self.quantity, 0, 0)
 
     @property
     def is_past_delay(self) -> bool:
         """
         returns True is the order is past delay
+        Note
+        ----
+        1) expiry time is cached till the timestamp or delay is changed
         """
         if self.timestamp:
-            expiry = self.timestamp.add(microseconds=self._delay)
+            expiry = self._expiry
+            if expiry is None:
+                expiry = self._expiry = self.timestamp.add(microseconds=self._delay)
             return True if pendulum.now(tz="local") > expiry else False
         else:
             return False
 
     @property
     def status(self) -> Status:
+        """
+        returns the status of the order
+        Note
+        ----
+        1) status is cached and computed again only when the quantity
+        fields or the status message are assigned
+        """
+        return self._status
+
+    def _get_status(self) -> Status:
+        """
+        Compute the status of the order from the quantities
+        """
         if self.quantity == self.filled_quantity:
             return Status.COMPLETE
         elif self.quantity == self.canceled_quantity:
             if self.status_message:
-                if str(self.status_message).upper().startswith("REJ"):
+                if str(self.status_message)[:3].upper() == "REJ":
                     return Status.REJECTED
                 else:
                     return Status.CANCELED
@@ -309,7 +487,10 @@ class VOrder(BaseModel):
                 average_price = self.price
         else:
             average_price = self.average_price
-        return self.side.value * self.filled_quantity * average_price
+        sign = self._side_sign
+        if sign is None:
+            sign = self._side_sign = self.side.value
+        return sign * self.filled_quantity * average_price
 
     @property
     def is_done(self) -> bool:
@@ -317,6 +498,22 @@ class VOrder(BaseModel):
         whether the order is finished either by fully filled
         or canceled
         returns True if it is done, False if pending
+        Note
+        ----
+        1) cached along with the status
+        """
+        return self._is_done
+
+    def _update_status(self) -> None:
+        """
+        Update the cached status and whether the order is done
+        """
+        self._status = self._get_status()
+        self._is_done = self._get_is_done()
+
+    def _get_is_done(self) -> bool:
+        """
+        Compute whether the order is done from the quantities
         """
         if self.quantity == self.filled_quantity:
             return True
@@ -333,12 +530,7 @@ class VOrder(BaseModel):
         returns True if the entire order is completely filled
         else False
         """
-        if self.quantity == self.filled_quantity:
-            return True
-        elif self.status == Status.COMPLETE:
-            return True
-        else:
-            return False
+        return self._status == Status.COMPLETE
 
     def modify_by_status(self, status: Status = Status.COMPLETE) -> bool:
         """
@@ -358,9 +550,7 @@ class VOrder(BaseModel):
             self.exchange_order_id = uuid.uuid4().hex
 
     def set_exchange_timestamp(self):
-        print(pendulum.now())
         if not (self.exchange_timestamp):
-            print(pendulum.now())
             self.exchange_timestamp = pendulum.now(tz="local")
 
 
@@ -370,20 +560,46 @@ class VPosition(BaseModel):
     sell_quantity: Optional[Union[int, float]]
     buy_value: Optional[float]
     sell_value: Optional[float]
+    _derived: Optional[Tuple[float, float, float, float]] = PrivateAttr(default=None)
 
     class Config:
         validate_assignment = True
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in _VPOSITION_FIELDS:
+            self._derived = None
+
+    def _get_derived(self) -> Tuple[float, float, float, float]:
+        """
+        returns the average buy price, average sell price,
+        net quantity and net value of the position
+        Note
+        ----
+        1) values are computed together and cached till
+        a quantity or value is changed
+        """
+        derived = self._derived
+        if derived is None:
+            buy_qty = self.buy_quantity if self.buy_quantity else 0
+            sell_qty = self.sell_quantity if self.sell_quantity else 0
+            buy_value = self.buy_value if self.buy_value else 0
+            sell_value = self.sell_value if self.sell_value else 0
+            derived = self._derived = (
+                buy_value / buy_qty if buy_qty and buy_value else 0.0,
+                sell_value / sell_qty if sell_qty and sell_value else 0.0,
+                buy_qty - sell_qty,
+                buy_value - sell_value,
+            )
+        return derived
+
     @property
     def average_buy_price(self) -> float:
         """
         Get the average buy price
         returns 0 if there is no price or quantity
         """
-        if self.buy_quantity and self.buy_value:
-            return self.buy_value / self.buy_quantity
-        else:
-            return 0.0
+        return self._get_derived()[0]
 
     @property
     def average_sell_price(self) -> float:
@@ -391,10 +607,24 @@ class VPosition(BaseModel):
         Get the average sell price
         returns 0 if there is no price or quantity
         """
-        if self.sell_quantity and self.sell_value:
-            return self.sell_value / self.sell_quantity
+        return self._get_derived()[1]
+
+    def apply_fill(self, side: Side, quantity: float, price: float) -> None:
+        """
+        Update the position with a fill
+        side
+            side of the fill
+        quantity
+            filled quantity
+        price
+            fill price
+        """
+        if side == Side.BUY:
+            self.buy_quantity = (self.buy_quantity or 0) + quantity
+            self.buy_value = (self.buy_value or 0) + quantity * price
         else:
-            return 0.0
+            self.sell_quantity = (self.sell_quantity or 0) + quantity
+            self.sell_value = (self.sell_value or 0) + quantity * price
 
     @property
     def net_quantity(self) -> float:
@@ -402,9 +632,7 @@ class VPosition(BaseModel):
         Get the net quantity for the position
         negative indicates sell and positive indicates sell
         """
-        buy_qty = self.buy_quantity if self.buy_quantity else 0
-        sell_qty = self.sell_quantity if self.sell_quantity else 0
-        return buy_qty - sell_qty
+        return self._get_derived()[2]
 
     @property
     def net_value(self) -> float:
@@ -412,9 +640,7 @@ class VPosition(BaseModel):
         Get the net value for the position
         negative indicates a net sell value and positive indicates a net buy value
         """
-        buy_value = self.buy_value if self.buy_value else 0
-        sell_value = self.sell_value if self.sell_value else 0
-        return buy_value - sell_value
+        return self._get_derived()[3]
 
 
 class VUser(BaseModel):
@@ -441,9 +667,10 @@ class Response(BaseModel):
         validate_assignment = True
 
     def __init__(self, **data):
+        # Timestamp is set before validation to avoid a validated assignment
+        if data.get("timestamp") is None:
+            data["timestamp"] = pendulum.now(tz="local")
         super().__init__(**data)
-        if self.timestamp is None:
-            self.timestamp = pendulum.now(tz="local")
 
 
 class OrderResponse(Response):
@@ -532,12 +759,10 @@ class OrderFill(BaseModel):
         if order_type == OrderType.LIMIT:
             if side == Side.BUY:
                 if price > ltp:
-                    self.order.filled_quantity = self.order.quantity
-                    self.order.average_price = self.last_price
+                    self.order._set_fill(self.order.quantity, self.last_price)
             elif side == Side.SELL:
                 if price < ltp:
-                    self.order.filled_quantity = self.order.quantity
-                    self.order.average_price = self.last_price
+                    self.order._set_fill(self.order.quantity, self.last_price)
             self.order._make_right_quantity()
 
     def update(self, last_price: float = None):
@@ -553,17 +778,14 @@ class OrderFill(BaseModel):
         order_type = order.order_type
         if order_type == OrderType.MARKET:
             order.price = last_price
-            order.average_price = last_price
-            order.filled_quantity = order.quantity
+            order._set_fill(order.quantity, last_price)
             order._make_right_quantity()
         elif order_type == OrderType.LIMIT:
             if side == Side.BUY:
                 if last_price < order.price:
-                    order.average_price = order.price
-                    order.filled_quantity = order.quantity
+                    order._set_fill(order.quantity, order.price)
                     order._make_right_quantity()
             elif side == Side.SELL:
                 if last_price > order.price:
-                    order.average_price = order.price
-                    order.filled_quantity = order.quantity
+                    order._set_fill(order.quantity, order.price)
                     order._make_right_quantity()
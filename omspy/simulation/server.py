@@ -1,6 +1,8 @@
-from typing import Optional, Type
+from typing import Any, Dict, Optional, Type
+import pendulum
 from pydantic import BaseModel
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from omspy.simulation.virtual import FakeBroker
 from omspy.simulation.models import (
     OrderResponse,
@@ -38,17 +40,30 @@ class MyAPI(FastAPI):
 
     broker: FakeBroker = FakeBroker()
 
-    @property
-    def _type(self) -> Type[FakeBroker]:
-        return type(self.broker)
 
-
-app: MyAPI = MyAPI(title="Fake Data API for Stock Market", description=description)
+app: MyAPI = MyAPI(
+    title="Fake Data API for Stock Market",
+    description=description,
+    default_response_class=ORJSONResponse,
+)
 
 SUCCESS = ResponseStatus.SUCCESS
 FAILURE = ResponseStatus.FAILURE
 
 
+def _success(response_class: Type[OrderResponse], data: Any) -> OrderResponse:
+    """
+    Build a success response without validation
+    Note
+    ----
+    1) data returned by the broker is already validated
+    so validating it again is skipped
+    """
+    return response_class.construct(
+        status=SUCCESS, data=data, timestamp=pendulum.now(tz="local")
+    )
+
+
 class OrderArgs(BaseModel):
     symbol: Optional[str]
     side: Optional[Side]
@@ -72,6 +87,18 @@ class ModifyArgs(BaseModel):
     trigger_price: Optional[float]
 
 
+def _supplied(model: BaseModel) -> Dict[str, Any]:
+    """
+    Get the fields supplied by the client, skipping None values
+    Note
+    ----
+    1) same as model.dict(exclude_none=True) for flat models
+    but only looks at the fields that were set
+    """
+    values = model.__dict__
+    return {k: values[k] for k in model.__fields_set__ if values.get(k) is not None}
+
+
 @app.get("/", summary="Fake Stock Data")
 def home():
     return {"hello": "Welcome to Fake Stock Data"}
@@ -94,9 +121,8 @@ async def auth(user_id: str) -> AuthResponse:
     tags=["order"],
 )
 async def create_order(order: OrderArgs) -> OrderResponse:
-    if app._type == FakeBroker:
-        response = app.broker.order_place(**order.dict(exclude_none=True))
-    return OrderResponse(status=SUCCESS, data=response)
+    response = app.broker.order_place(**_supplied(order))
+    return _success(OrderResponse, response)
 
 
 @app.put(
@@ -106,11 +132,8 @@ async def create_order(order: OrderArgs) -> OrderResponse:
     tags=["order"],
 )
 async def modify_order(order_id: str, order: OrderArgs) -> OrderResponse:
-    if app._type == FakeBroker:
-        response = app.broker.order_modify(
-            order_id=order_id, **order.dict(exclude_none=True)
-        )
-    return OrderResponse(status=SUCCESS, data=response)
+    response = app.broker.order_modify(order_id=order_id, **_supplied(order))
+    return _success(OrderResponse, response)
 
 
 @app.delete(
@@ -120,11 +143,8 @@ async def modify_order(order_id: str, order: OrderArgs) -> OrderResponse:
     tags=["order"],
 )
 async def cancel_order(order_id: str, order: OrderArgs) -> OrderResponse:
-    if app._type == FakeBroker:
-        response = app.broker.order_cancel(
-            order_id=order_id, **order.dict(exclude_none=True)
-        )
-    return OrderResponse(status=SUCCESS, data=response)
+    response = app.broker.order_cancel(order_id=order_id, **_supplied(order))
+    return _success(OrderResponse, response)
 
 
 @app.get(
@@ -134,7 +154,7 @@ async def cancel_order(order_id: str, order: OrderArgs) -> OrderResponse:
 )
 async def ltp(symbol: str) -> LTPResponse:
     response = app.broker.ltp(symbol)
-    return LTPResponse(status=SUCCESS, data=response)
+    return _success(LTPResponse, response)
 
 
 @app.get(
@@ -144,7 +164,7 @@ async def ltp(symbol: str) -> LTPResponse:
 )
 async def ohlc(symbol: str) -> OHLCVResponse:
     response = app.broker.ohlc(symbol)
-    return OHLCVResponse(status=SUCCESS, data=response)
+    return _success(OHLCVResponse, response)
 
 
 @app.get(
@@ -155,7 +175,7 @@ async def ohlc(symbol: str) -> OHLCVResponse:
 )
 async def quote(symbol: str) -> QuoteResponse:
     response = app.broker.quote(symbol)
-    return QuoteResponse(status=SUCCESS, data=response)
+    return _success(QuoteResponse, response)
 
 
 @app.get(
@@ -165,10 +185,10 @@ async def quote(symbol: str) -> QuoteResponse:
 )
 async def orderbook(symbol: str) -> OrderBookResponse:
     response = app.broker.orderbook(symbol)
-    return OrderBookResponse(status=SUCCESS, data=response)
+    return _success(OrderBookResponse, response)
 
 
 @app.get("/positions", summary="Get random positions", tags=["user"])
 async def positions() -> PositionResponse:
     response = app.broker.positions()
-    return PositionResponse(status=SUCCESS, data=response)
+    return _success(PositionResponse, response)
@@ -394,12 +394,13 @@ class FakeBroker(BaseModel):
             sq = random.randrange(0, 1000)
             bv = random.randrange(10, 3000)
             sv = random.randrange(int(bv * 0.5), int(bv * 2))
-            position = VPosition(
+            # Generated values are already of the right type
+            position = VPosition.construct(
                 symbol=symbol,
                 buy_quantity=bq,
                 sell_quantity=sq,
-                buy_value=bv,
-                sell_value=sv,
+                buy_value=float(bv),
+                sell_value=float(sv),
             )
             positions.append(position)
         return positions
@@ -416,9 +417,9 @@ class FakeBroker(BaseModel):
         orders = []
         for symbol in symbols:
             order_id = uuid.uuid4().hex
-            quantity = random.randrange(10, 100)
+            quantity = float(random.randrange(10, 100))
             price = round(random.random() * random.randrange(10, 100), 2)
-            order = VOrder(
+            order = VOrder.construct_fast(
                 order_id=order_id,
                 symbol=symbol,
                 quantity=quantity,
@@ -446,7 +447,7 @@ class FakeBroker(BaseModel):
             trade_id = uuid.uuid4().hex
             quantity = random.randrange(10, 100)
             price = round(random.random() * random.randrange(10, 100), 2)
-            trade = VTrade(
+            trade = VTrade.construct(
                 trade_id=trade_id,
                 order_id=order_id,
                 symbol=symbol,
@@ -7,6 +7,7 @@ from unittest.mock import patch, call
 from omspy.brokers.zerodha import Zerodha
 from pydantic import ValidationError
 from copy import deepcopy
+import asyncio
 
 
 @pytest.fixture
@@ -287,6 +288,69 @@ def test_existing_peg_run(broker):
         broker.order_modify.assert_called_once()
 
 
+@patch("omspy.brokers.zerodha.Zerodha")
+def test_existing_peg_arun(broker):
+    known = pendulum.datetime(2022, 4, 1, 10, 0)
+    with pendulum.test(known):
+        orders = [
+            Order(symbol="amzn", quantity=20, side="buy"),
+            Order(symbol="goog", quantity=20, side="sell"),
+        ]
+        pegs = [PegExisting(order=order, broker=broker) for order in orders]
+        for peg in pegs:
+            peg.execute()
+
+    async def run_all(ltp):
+        await asyncio.gather(*(peg.arun(ltp=ltp) for peg in pegs))
+
+    with pendulum.test(known.add(seconds=11)):
+        asyncio.run(run_all(228))
+    assert [order.price for order in orders] == [228, 228]
+    assert broker.order_modify.call_count == 2
+
+
+@patch("omspy.brokers.zerodha.Zerodha")
+def test_peg_arun_with_connection(broker):
+    broker.order_place.side_effect = range(10000, 10009)
+    con = create_db()
+    known = pendulum.datetime(2022, 4, 1, 10, 0)
+    with pendulum.test(known):
+        order = Order(symbol="amzn", quantity=20, side="buy", connection=con)
+        peg = PegExisting(order=order, broker=broker)
+        orders = [
+            Order(symbol="aapl", side="buy", quantity=10, connection=con),
+            Order(symbol="goog", side="buy", quantity=10, connection=con),
+        ]
+        sequential = PegSequential(orders=orders, broker=broker)
+        peg.execute()
+
+    async def run_all():
+        await asyncio.gather(
+            peg.arun(ltp=228), sequential.arun(ltp=dict(aapl=150, goog=120))
+        )
+
+    with pendulum.test(known.add(seconds=11)):
+        asyncio.run(run_all())
+    assert broker.order_modify.call_count == 1
+    rows = {
+        row["symbol"]: row
+        for row in con.query("select symbol, price, order_id from orders")
+    }
+    assert order.price == 228
+    assert rows["amzn"]["order_id"] is not None
+    # First order of the sequence is placed and saved during arun
+    assert rows["aapl"]["order_id"] is not None
+    assert "goog" not in rows
+
+
+def test_existing_peg_same_order():
+    order = Order(symbol="amzn", quantity=20, side="buy")
+    peg = PegExisting(order=order, broker=Paper())
+    assert peg.order is order
+    peg = PegSequential(orders=[order], broker=Paper())
+    assert peg.orders[0] is order
+
+
 def test_existing_peg_validation_pending():
     known = pendulum.datetime(2022, 4, 1, 10, 0)
     order = Order(symbol="amzn", quantity=20, side="buy", status="COMPLETE")
@@ -477,6 +541,41 @@ def test_peg_sequential_get_current_order(order_list):
     assert peg.get_current_order() is None
 
 
+def test_peg_sequential_get_current_order_index(order_list):
+    orders = order_list
+    peg = PegSequential(orders=orders, peg_every=3)
+    assert peg.get_current_order().order is orders[0]
+    assert peg._current_index == 0
+    orders[0].filled_quantity = 10
+    orders[1].status = "REJECTED"
+    assert peg.get_current_order().order is orders[2]
+    assert peg._current_index == 2
+    orders[2].status = "COMPLETE"
+    assert peg.get_current_order() is None
+    assert peg._current_index == 3
+
+
+def test_peg_sequential_get_current_order_index_reset(order_list):
+    orders = order_list
+    peg = PegSequential(orders=orders, peg_every=3)
+    orders[0].filled_quantity = 10
+    assert peg.get_current_order().order is orders[1]
+    assert peg._current_index == 1
+    # An earlier order is pending again
+    orders[0].filled_quantity = 5
+    assert peg.get_current_order().order is orders[0]
+    assert peg._current_index == 0
+    # Orders are reordered
+    orders[0].filled_quantity = 10
+    assert peg.get_current_order().order is orders[1]
+    peg.orders = [orders[1], orders[0], orders[2]]
+    assert peg.get_current_order().order is orders[1]
+    assert peg._current_index == 0
+    # Orders are replaced
+    peg.orders = [Order(symbol="dow", side="buy", quantity=10)]
+    assert peg.get_current_order().order is peg.orders[0]
+
+
 def test_peg_sequential_set_current_order(order_list):
     orders = order_list
     peg = PegSequential(orders=orders, peg_every=3)
@@ -622,6 +721,32 @@ def test_peg_sequential_dont_execute_after_time2(sequential_peg):
     assert peg.broker.order_cancel.call_count == 0
 
 
+def test_peg_sequential_stop_after_expiry(sequential_peg):
+    peg = sequential_peg
+    peg.stop_after_expiry = True
+    known = pendulum.datetime(2022, 1, 1, 10, tz="local")
+    ltp1 = dict(aapl=100, goog=200, amzn=300, dow=400)
+    with pendulum.test(known.add(seconds=5)):
+        peg.run(ltp=ltp1)
+    assert peg.broker.order_place.call_count == 1
+    with pendulum.test(known.add(seconds=60)):
+        peg.run(ltp=ltp1)
+    assert peg.broker.order_place.call_count == 1
+    assert peg.broker.order_cancel.call_count == 1
+    assert [order.status for order in peg.orders] == [None] + ["CANCELED"] * 3
+    assert peg.done is False
+    for i in range(3):
+        with pendulum.test(known.add(seconds=62 + i)):
+            peg.run(ltp=ltp1)
+    # Pending orders are canceled only once after expiry
+    assert peg.broker.order_cancel.call_count == 1
+    assert peg.done is False
+    peg.orders[0].status = "CANCELED"
+    with pendulum.test(known.add(seconds=61)):
+        peg.run(ltp=ltp1)
+    assert peg.done is True
+
+
 def test_peg_sequential_modify_after_time(sequential_peg):
     peg = sequential_peg
     for order in peg.orders:
@@ -958,3 +1083,111 @@ def test_peg_sequential_force_order_type_different_types(order_list):
     for a, b in zip(call_args_list, expected_call_args):
         assert a.kwargs == b
     assert peg.broker.order_modify.call_count == 3
+
+
+def test_peg_sequential_run_after_expiry_batch_cancel(order_list):
+    class BatchPaper(Paper):
+        def order_cancel_batch(self, orders):
+            pass
+
+    orders = order_list
+    peg = PegSequential(orders=orders, broker=BatchPaper())
+    orders[0].order_id = "aaaaaa"
+    orders[1].order_id = "bbbbbb"
+    orders[1].convert_to_market_after_expiry = True
+    orders[1].cancel_after_expiry = False
+    with patch.object(BatchPaper, "order_cancel_batch") as cancel_batch, patch.object(
+        BatchPaper, "order_cancel"
+    ) as cancel, patch.object(BatchPaper, "order_modify") as modify:
+        peg.run_after_expiry()
+        cancel_batch.assert_called_once_with(orders=[dict(order_id="aaaaaa")])
+        cancel.assert_not_called()
+        modify.assert_called_once()
+    assert orders[2].status == "CANCELED"
+
+
+def test_peg_sequential_run_after_expiry_batch_cancel_args(order_list):
+    broker = Paper()
+    broker.attribs_to_copy_cancel = ("exchange",)
+    orders = order_list
+    peg = PegSequential(orders=orders, broker=broker)
+    orders[0].order_id = "aaaaaa"
+    orders[0].exchange = "NSE"
+    orders[1].order_id = "bbbbbb"
+    with patch.object(Paper, "order_cancel") as cancel:
+        cancel.side_effect = ["aaaaaa", ValueError("rejected")]
+        assert peg.run_after_expiry() is False
+        assert cancel.call_args_list == [
+            call(order_id="aaaaaa", exchange="NSE"),
+            call(order_id="bbbbbb"),
+        ]
+    assert orders[0].status is None
+    assert orders[1].status is None
+    assert orders[2].status == "CANCELED"
+
+
+def test_peg_sequential_stop_after_expiry_retry_failed_cancel(sequential_peg):
+    peg = sequential_peg
+    peg.stop_after_expiry = True
+    known = pendulum.datetime(2022, 1, 1, 10, tz="local")
+    ltp = dict(aapl=100, goog=200, amzn=300, dow=400)
+    with patch.object(PegSequential, "run_after_expiry") as run_after_expiry:
+        run_after_expiry.side_effect = [False, True]
+        for i in range(3):
+            with pendulum.test(known.add(seconds=60 + i)):
+                peg.run(ltp=ltp)
+    assert run_after_expiry.call_count == 2
+
+
+@patch("omspy.brokers.paper.Paper")
+def test_peg_market_run_ltp(broker):
+    known = pendulum.datetime(2022, 1, 1, 10)
+    pendulum.set_test_now(known)
+    peg = PegMarket(
+        symbol="aapl",
+        side="buy",
+        quantity=100,
+        broker=broker,
+        order_args={"product": "mis", "validity": "day"},
+    )
+    pendulum.set_test_now(known.add(seconds=13))
+    peg.run(ltp={"aapl": 158.4, "goog": 300})
+    assert peg.ltp == {"aapl": 158.4, "goog": 300}
+    broker.order_modify.assert_called_once()
+    assert broker.order_modify.call_args.kwargs["price"] == 158.4
+    peg.orders[0].filled_quantity = 100
+    pendulum.set_test_now(known.add(seconds=24))
+    peg.run(ltp={"aapl": 159})
+    assert broker.order_modify.call_count == 1
+    pendulum.set_test_now()
+
+
+def test_existing_peg_next_deadline(existing_peg):
+    peg = existing_peg
+    known = pendulum.datetime(2022, 1, 1, 10, tz="local")
+    assert peg.next_deadline == known.add(seconds=3)
+    with pendulum.test(known.add(seconds=9)):
+        peg.run(ltp=251)
+    assert peg.next_deadline == known.add(seconds=10)
+
+
+def test_peg_sequential_next_deadline(sequential_peg):
+    peg = sequential_peg
+    known = pendulum.datetime(2022, 1, 1, 10, tz="local")
+    ltp = dict(aapl=100, goog=200, amzn=300, dow=400)
+    with pendulum.test(known):
+        # First order is yet to be placed
+        assert peg.next_deadline == known
+        peg.run(ltp=ltp)
+        assert peg.next_deadline == known.add(seconds=4)
+    with pendulum.test(known.add(seconds=2)):
+        # Current order is done so the next order is due
+        peg.orders[0].filled_quantity = peg.orders[0].quantity
+        assert peg.next_deadline == known.add(seconds=2)
+        peg.run(ltp=ltp)
+        assert peg.next_deadline == known.add(seconds=6)
+    for order in peg.orders:
+        order.status = "CANCELED"
+    peg.run(ltp=ltp)
+    assert peg.done is True
+    assert peg.next_deadline == known.add(seconds=48)
@@ -92,6 +92,15 @@ def test_stop_order(stop_order):
     assert [o.order_type for o in stop_order.orders] == ["LIMIT", "SL-M"]
 
 
+def test_stop_order_default_order_type(order_dict):
+    order_dict.pop("order_type")
+    order = StopOrder(**order_dict)
+    assert order.order_type == ("LIMIT", "SL-M")
+    assert [o.order_type for o in order.orders] == ["LIMIT", "SL-M"]
+    order = StopOrder(order_type=None, **order_dict)
+    assert [o.order_type for o in order.orders] == ["LIMIT", "SL-M"]
+
+
 def test_stop_order_execute_all(stop_order):
     broker = stop_order.broker
     stop_order.execute_all()
@@ -162,13 +171,26 @@ def test_trailing_stop_run_sell(trailing_stop_dict):
     dct.update({"side": "sell", "trigger_price": 1000})
     order = TrailingStopOrder(**trailing_stop_dict)
     ltps = (930, 950, 980, 917, 894, 897, 920, 887)
-    sl = (1000, 1000, 1000, 990, 980, 970, 970, 960)
+    sl = (1000, 1000, 1000, 990, 970, 970, 970, 960)
     for l, s in zip(ltps, sl):
         order.run(ltp=l)
         print(l, s)
         assert order._stop_loss == s
         assert order.orders[-1].trigger_price == s
-    assert order.broker.order_modify.call_count == 4
+    assert order.broker.order_modify.call_count == 3
+
+
+def test_trailing_stop_run_jump(trailing_stop_dict):
+    order = TrailingStopOrder(**trailing_stop_dict)
+    order.run(ltp=975)
+    assert order._stop_loss == 890
+    assert order.next_trail == 980
+    order.run(ltp=980)
+    assert order._stop_loss == 890
+    order.run(ltp=1000)
+    assert order._stop_loss == 910
+    assert order.next_trail == 1000
+    assert order.broker.order_modify.call_count == 2
 
 
 def test_trailing_stop_run_no_price(trailing_stop_dict):
@@ -212,3 +234,53 @@ def test_target_order_sell_target_hit(order_dict):
         order.run(ltp=ltp)
     assert order.broker.order_place.call_count == 2
     order.broker.order_modify.assert_called_once()
+
+
+def test_target_order_run_ltp_dict(order_dict):
+    order_dict["target"] = 950
+    order = TargetOrder(**order_dict)
+    order.execute_all()
+    assert order.is_target_hit(949) is False
+    assert order.is_target_hit(950) is True
+    order.run(ltp={"goog": 1000})
+    order.run(ltp={"goog": 1000, "aapl": 940})
+    order.broker.order_modify.assert_not_called()
+    order.run(ltp={"goog": 900, "aapl": 955})
+    order.broker.order_modify.assert_called_once()
+
+
+def test_target_order_is_target_hit_side(order_dict):
+    order_dict["target"] = 950
+    order = TargetOrder(**order_dict)
+    assert order._side_sign == 1
+    assert order.is_target_hit(960) is True
+    order.side = "sell"
+    assert order._side_sign == -1
+    assert order.is_target_hit(960) is False
+    assert order.is_target_hit(940) is True
+    order.side = "BUY"
+    assert order._side_sign == 1
+    assert order.is_target_hit(960) is True
+    assert order.is_target_hit(940) is False
+    order.side = "unknown"
+    assert order.is_target_hit(960) is False
+    assert order.is_target_hit(940) is False
+
+
+def test_trailing_stop_run_upper_case_side(trailing_stop_dict):
+    trailing_stop_dict["side"] = "BUY"
+    order = TrailingStopOrder(**trailing_stop_dict)
+    assert order.orders[-1].side == "sell"
+    assert order._side_sign == 1
+    order.run(ltp={"aapl": 941})
+    assert order._stop_loss == 860
+    assert order.orders[-1].trigger_price == 860
+
+
+def test_trailing_stop_run_ltp_dict(trailing_stop_dict):
+    order = TrailingStopOrder(**trailing_stop_dict)
+    order.run(ltp={"goog": 1000})
+    assert order._stop_loss == 850
+    order.run(ltp={"goog": 900, "aapl": 941})
+    assert order._stop_loss == 860
+    assert order.orders[-1].trigger_price == 860
@@ -198,6 +198,20 @@ def test_vposition_price():
     assert pos.net_value == -2240
 
 
+def test_vposition_apply_fill():
+    pos = VPosition(symbol="aapl")
+    assert pos.average_buy_price == 0
+    pos.apply_fill(Side.BUY, 100, 100)
+    assert pos.average_buy_price == 100
+    pos.apply_fill(Side.BUY, 100, 110)
+    assert pos.buy_quantity == 200
+    assert pos.average_buy_price == 105
+    pos.apply_fill(Side.SELL, 50, 120)
+    assert pos.average_sell_price == 120
+    assert pos.net_quantity == 150
+    assert pos.net_value == 21000 - 6000
+
+
 def test_response():
     known = pendulum.datetime(2023, 2, 1, 12, 44, tz="local")
     with pendulum.test(known):
@@ -223,6 +237,17 @@ def test_order_response():
     assert d.status == Status.OPEN
 
 
+def test_response_validate_assignment():
+    resp = Response(status="success")
+    resp.status = "failure"
+    assert resp.status == ResponseStatus.FAILURE
+    with pytest.raises(ValidationError):
+        resp.status = "unknown"
+    order_response = OrderResponse(status="success")
+    with pytest.raises(ValidationError):
+        order_response.data = dict(order_id="order_id")
+
+
 def test_ohlc(ohlc_args):
     ohlc = OHLC(**ohlc_args)
     assert ohlc.open == 104
@@ -338,6 +363,12 @@ def test_vorder_custom_delay(vorder_kwargs):
         assert order.is_past_delay is False
     with pendulum.test(known.add(seconds=5)):
         assert order.is_past_delay is False
+    with pendulum.test(known.add(seconds=6)):
+        assert order.is_past_delay is True
+        order._delay = 10e6
+        assert order.is_past_delay is False
+        order.timestamp = known.subtract(seconds=5)
+        assert order.is_past_delay is True
 
 
 def test_vorder_modify_by_status_complete(vorder_simple):
@@ -462,6 +493,17 @@ def test_ticker_ltp(basic_ticker):
     assert ticker._low == 120.5
 
 
+def test_ticker_step_n(basic_ticker):
+    random.seed(1000)
+    ticker = basic_ticker
+    ohlc = ticker.step_n(15)
+    assert ohlc.dict() == dict(
+        open=125, high=125.3, low=120.5, close=120.5, last_price=120.5
+    )
+    ticker.mode = TickerMode.MANUAL
+    assert ticker.step_n(10) == ohlc
+
+
 def test_ticker_ohlc(basic_ticker):
     ticker = basic_ticker
     ticker.ohlc() == dict(open=125, high=125, low=125, close=125)
@@ -708,3 +750,89 @@ def test_vorder_order_type_as_str(vorder_kwargs):
     assert order.order_type == OrderType.MARKET
     with pytest.raises(ValidationError):
         order = VOrder(order_type="something", **kwargs)
+
+
+def test_vorder_fill_fields_assignment(vorder_kwargs):
+    order = VOrder(**vorder_kwargs)
+    order.filled_quantity = 40
+    order.pending_quantity = 60
+    order.average_price = 120.5
+    assert order.status == Status.PENDING
+    assert order.average_price == 120.5
+    assert "filled_quantity" in order.__fields_set__
+    assert order.dict()["pending_quantity"] == 60
+    with pytest.raises(ValidationError):
+        order.side = "unknown"
+    # Public assignment is validated
+    order.filled_quantity = "5"
+    assert order.filled_quantity == 5.0
+    assert order.status == Status.PENDING
+    with pytest.raises(ValidationError):
+        order.filled_quantity = "five"
+
+
+def test_vorder_set_fill(vorder_kwargs):
+    order = VOrder(**vorder_kwargs)
+    order._set_fill(100, 125.5)
+    assert order.filled_quantity == 100
+    assert order.average_price == 125.5
+    assert order.status == Status.COMPLETE
+    assert "filled_quantity" in order.__fields_set__
+
+
+def test_vorder_status_cached(vorder_kwargs):
+    order = VOrder(**vorder_kwargs)
+    assert order._status == Status.OPEN
+    order.filled_quantity = 100
+    assert order._status == Status.COMPLETE
+    order.filled_quantity = 0
+    order.canceled_quantity = 100
+    assert order.status == Status.CANCELED
+    order.status_message = "REJECTED: margin"
+    assert order.status == Status.REJECTED
+    order.quantity = 200
+    assert order.status == Status.PENDING
+    assert order.is_done is False
+    order.pending_quantity = 0
+    assert order.is_done is True
+
+
+def test_vorder_construct_fast(vorder_kwargs):
+    known = pendulum.datetime(2023, 1, 1, 10, tz="local")
+    kwargs = dict(vorder_kwargs)
+    kwargs["side"] = Side.BUY
+    with pendulum.test(known):
+        order = VOrder.construct_fast(**kwargs)
+        expected = VOrder(**kwargs)
+    assert order == expected
+    assert order.timestamp == known
+    assert order.status == expected.status
+    assert order._delay == 1e6
+
+
+def test_vorder_bulk_from_records(vorder_kwargs):
+    known = pendulum.datetime(2023, 1, 1, 10, tz="local")
+    records = [
+        dict(vorder_kwargs),
+        dict(vorder_kwargs, side="sell", order_type="limit", price=120),
+        dict(vorder_kwargs, side=-1, filled_quantity=40),
+    ]
+    with pendulum.test(known):
+        orders = VOrder.bulk_from_records(records)
+        expected = [VOrder(**record) for record in records]
+    assert orders == expected
+    assert [order.status for order in orders] == [order.status for order in expected]
+    assert orders[1].side == Side.SELL
+    assert orders[1].order_type == OrderType.LIMIT
+    assert orders[2].side == Side.SELL
+    assert orders[2].pending_quantity == 60
+    for order in orders:
+        assert order.timestamp == known
+
+
+def test_vorder_bulk_from_records_missing_field(vorder_kwargs):
+    records = [dict(vorder_kwargs), dict(vorder_kwargs)]
+    del records[1]["symbol"]
+    records[1]["side"] = None
+    with pytest.raises(ValueError, match="record 1 .* symbol, side"):
+        VOrder.bulk_from_records(records)
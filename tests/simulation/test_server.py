@@ -171,3 +171,13 @@ def test_positions():
         assert "symbol" in pos
         assert "buy_quantity" in pos
         assert "sell_quantity" in pos
+
+
+def test_order_explicit_none():
+    data = dict(symbol="amzn", side=1, quantity=100, price=None)
+    response = client.post("/order", json=data)
+    assert response.status_code == 200
+    r = response.json()["data"]
+    assert r["quantity"] == 100
+    assert r["price"] > 0
+    assert r["filled_quantity"] == 100
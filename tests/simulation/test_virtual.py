@@ -193,6 +193,16 @@ def test_virtual_broker_order_place_success(basic_broker):
     assert len(b._orders) == 1
 
 
+def test_virtual_broker_order_place_same_order(basic_broker):
+    b = basic_broker
+    response = b.order_place(symbol="aapl", quantity=10, side=1)
+    order = response.data
+    assert order is b._orders[order.order_id]
+    response = b.order_modify(order.order_id, price=100)
+    assert response.data is order
+    assert order.price == 100
+
+
 def test_virtual_broker_order_place_success_fields(basic_broker):
     b = basic_broker
     known = pendulum.datetime(2023, 2, 1, 10, 17)
@@ -639,6 +649,14 @@ def test_fake_broker_positions_symbols():
     assert set([p.symbol for p in positions]) == set(symbols)
 
 
+def test_fake_broker_positions_types():
+    b = FakeBroker()
+    for position in b.positions(symbols=["tsla", "amzn"]):
+        assert isinstance(position.buy_value, float)
+        assert isinstance(position.sell_value, float)
+        assert position == VPosition(**position.dict())
+
+
 def test_virtual_broker_add_user():
     b = VirtualBroker()
     assert len(b.users) == len(b.clients) == 0
@@ -1,12 +1,16 @@
 import pytest
-from unittest.mock import patch, call
+from pydantic import ValidationError
+from unittest.mock import patch, call, PropertyMock
 from omspy.order import *
+from omspy.order import _next_id, _get_upsert_sql
 from omspy.brokers.paper import Paper
 from collections import Counter
 import pendulum
 from copy import deepcopy
 import sqlite3
+import pickle
 import json
+import uuid
 from sqlite_utils import Database
 from omspy.models import OrderLock
 
@@ -157,6 +161,36 @@ def test_order_simple():
     assert order._frozen_attrs == {"symbol", "side"}
 
 
+def test_order_construct_fast():
+    known = pendulum.datetime(2021, 1, 1, 12, tz="Europe/Paris")
+    with pendulum.test(known):
+        order = Order.construct_fast(
+            symbol="aapl", side="SELL", quantity=10, timezone="Europe/Paris"
+        )
+        expected = Order(
+            symbol="aapl",
+            side="SELL",
+            quantity=10,
+            timezone="Europe/Paris",
+            id=order.id,
+        )
+    assert order == expected
+    assert order.pending_quantity == 10
+    assert order.expires_in == expected.expires_in
+    assert order.timestamp == known
+    assert order.lock == OrderLock()
+    assert order._sign == -1
+
+
+def test_order_side_sign():
+    order = Order(symbol="aapl", side="BUY", quantity=10)
+    assert order._side_lc == "buy"
+    assert order._sign == 1
+    order.side = "Sell"
+    assert order._side_lc == "sell"
+    assert order._sign == -1
+
+
 def test_order_id_custom():
     order = Order(symbol="aapl", side="buy", quantity=10, id="some_hex_digit")
     assert order.id == "some_hex_digit"
@@ -333,6 +367,44 @@ def test_compound_order_average_sell_price(compound_order_average_prices):
     assert dct == dict(goog=657.14)
 
 
+def test_compound_order_add_orders(simple_compound_order):
+    order = simple_compound_order
+    con = order.connection
+    con2 = create_db()
+    ids = order.add_orders(
+        [
+            dict(symbol="beta", quantity=17, side="buy"),
+            dict(symbol="gamma", quantity=12, side="sell", key="gamma"),
+            dict(symbol="delta", quantity=15, side="buy", connection=con2),
+        ]
+    )
+    assert len(ids) == 3
+    assert order.count == 6
+    assert [o.id for o in order.orders[3:]] == ids
+    assert order.get("gamma").symbol == "gamma"
+    assert order.get(4).symbol == "gamma"
+    result = con.execute("select symbol from orders").fetchall()
+    assert [r[0] for r in result] == ["aapl", "goog", "aapl", "beta", "gamma"]
+    result = con2.execute("select symbol,parent_id from orders").fetchall()
+    assert result == [("delta", order.id)]
+
+
+def test_compound_order_add_orders_error(simple_compound_order):
+    order = simple_compound_order
+    con = order.connection
+    with pytest.raises(IndexError):
+        order.add_orders(
+            [
+                dict(symbol="beta", quantity=17, side="buy"),
+                dict(symbol="gamma", quantity=12, side="sell", index=0),
+            ]
+        )
+    # Orders added before the error are still saved
+    assert order.count == 4
+    result = con.execute("select * from orders").fetchall()
+    assert len(result) == 4
+
+
 def test_compound_order_update_orders(simple_compound_order):
     order = simple_compound_order
     order_data = {
@@ -536,6 +608,19 @@ def test_order_expires():
     assert order.expires_in == 600
 
 
+def test_order_expires_next_day():
+    known = pendulum.datetime(2021, 1, 1, 18, tz="Europe/Paris")
+    with pendulum.test(known):
+        order = Order(symbol="aapl", side="buy", timezone="Europe/Paris")
+        assert order.expires_in == (60 * 60 * 6) - 1
+    with pendulum.test(known.add(hours=8)):
+        order = Order(symbol="aapl", side="buy", timezone="Europe/Paris")
+        assert order.expires_in == (60 * 60 * 22) - 1
+    with pendulum.test(known.add(hours=8).in_tz("UTC")):
+        order = Order(symbol="aapl", side="buy", timezone="UTC")
+        assert order.expires_in == (60 * 60 * 23) - 1
+
+
 def test_order_expiry_times():
     known = pendulum.datetime(2021, 1, 1, 9, 30, tz="UTC")
     pendulum.set_test_now(known)
@@ -565,6 +650,25 @@ def test_order_has_expired():
     pendulum.set_test_now()
 
 
+def test_order_has_expired_at():
+    known = pendulum.datetime(2021, 1, 1, 10, tz="UTC")
+    with pendulum.test(known):
+        order = Order(
+            symbol="aapl",
+            side="buy",
+            quantity=10,
+            expires_in=60,
+            timezone="Asia/Kolkata",
+        )
+    assert order.has_expired_at(known.add(seconds=30)) is False
+    assert order.time_to_expiry_at(known.add(seconds=30)) == 30
+    assert order.time_after_expiry_at(known.add(seconds=30)) == 0
+    now = known.add(seconds=75).in_tz("America/New_York")
+    assert order.has_expired_at(now) is True
+    assert order.time_to_expiry_at(now) == 0
+    assert order.time_after_expiry_at(now) == 15
+
+
 def test_order_has_parent():
     order = Order(symbol="aapl", side="buy", quantity=10)
     assert order.has_parent is False
@@ -633,6 +737,108 @@ def test_compound_order_pending_orders(simple_compound_order):
     assert len(order.pending_orders) == 1
 
 
+def test_compound_order_pending_orders_cache(simple_compound_order):
+    order = simple_compound_order
+    pending = order.orders[-1]
+    assert order.pending_orders == [pending]
+    assert order._pending == [pending]
+    with patch.object(Order, "is_pending", new_callable=PropertyMock) as is_pending:
+        order.pending_orders
+        order.completed_orders
+        is_pending.assert_not_called()
+    pending.filled_quantity = 12
+    assert order.pending_orders == []
+    assert len(order.completed_orders) == 3
+    order.add_order(symbol="beta", quantity=17, side="buy")
+    assert order.pending_orders == order.orders[-1:]
+    order.orders.append(Order(symbol="gamma", quantity=10, side="buy"))
+    assert order.pending_orders == order.orders[-2:]
+
+
+def test_compound_order_cache_initial_orders():
+    order = Order(symbol="aapl", side="buy", quantity=10)
+    com = CompoundOrder(broker=Paper(), orders=[order])
+    assert com.orders[0] is order
+    assert com.pending_orders == [order]
+    assert com.positions == Counter({"aapl": 0})
+    order.filled_quantity = 10
+    assert com.pending_orders == []
+    assert com.positions == Counter({"aapl": 10})
+
+
+def test_compound_order_aggregates_cache(simple_compound_order):
+    order = simple_compound_order
+    order.update_ltp({"aapl": 900, "goog": 300})
+    assert order.positions == Counter({"aapl": 11, "goog": -10})
+    assert order._aggregates is not None
+    with patch.object(Order, "_sign", new_callable=PropertyMock) as sign:
+        assert order.net_value == Counter({"aapl": 9625, "goog": -3380})
+        assert order.mtm == Counter({"aapl": 275, "goog": 380})
+        assert order.buy_quantity == Counter({"aapl": 20})
+        assert order.sell_quantity == Counter({"aapl": 9, "goog": 10})
+        sign.assert_not_called()
+    order.orders[-1].filled_quantity = 12
+    assert order.positions == Counter({"aapl": 8, "goog": -10})
+    order.orders[-1].average_price = 1000
+    assert order.net_value == Counter({"aapl": 6400, "goog": -3380})
+    order.add_order(
+        symbol="goog", quantity=10, side="buy", filled_quantity=10, average_price=310
+    )
+    assert order.positions == Counter({"aapl": 8, "goog": 0})
+    order.update_ltp({"aapl": 950})
+    assert order.mtm == Counter({"aapl": 1200, "goog": 280})
+
+
+def test_compound_order_pending_orders_cache_orders_changed():
+    broker = Paper()
+    com = CompoundOrder(broker=broker)
+    com.add_order(symbol="aapl", side="buy", quantity=10)
+    assert len(com.pending_orders) == 1
+    com.orders.extend([Order(symbol="goog", side="buy", quantity=10)])
+    assert len(com.pending_orders) == 2
+    com.orders[1] = Order(symbol="goog", side="buy", quantity=10, filled_quantity=10)
+    assert com.pending_orders == com.orders[:1]
+    assert com.completed_orders == com.orders[1:]
+    shared = com.orders[0]
+    com2 = CompoundOrder(broker=broker)
+    com2.add(shared)
+    shared.filled_quantity = 10
+    assert com.pending_orders == []
+    assert com2.pending_orders == []
+
+
+def test_order_pickle_in_compound_order():
+    com = CompoundOrder(broker=Paper())
+    com.add_order(symbol="aapl", side="buy", quantity=10)
+    order = com.orders[0]
+    assert len(pickle.dumps(order)) < len(pickle.dumps(com))
+    copied = deepcopy(order)
+    assert copied.symbol == "aapl"
+
+
+def test_compound_order_aggregates_cache_orders_changed():
+    broker = Paper()
+    com = CompoundOrder(broker=broker)
+    com.add_order(symbol="aapl", side="buy", quantity=10)
+    assert com.positions == Counter({"aapl": 0})
+    # Orders added without add_order
+    com.orders.extend([Order(symbol="goog", side="buy", quantity=10)])
+    assert com.positions == Counter({"aapl": 0, "goog": 0})
+    # Order replaced at the same position
+    com.orders[0] = Order(symbol="amzn", side="sell", quantity=5, filled_quantity=5)
+    assert com.positions == Counter({"amzn": -5, "goog": 0})
+    # Order shared by two compound orders
+    shared = Order(symbol="beta", side="buy", quantity=10)
+    com2 = CompoundOrder(broker=broker)
+    com.add(shared)
+    com2.add(shared)
+    assert com.positions["beta"] == 0
+    assert com2.positions["beta"] == 0
+    shared.filled_quantity = 10
+    assert com.positions["beta"] == 10
+    assert com2.positions["beta"] == 10
+
+
 def test_order_create_db():
     order = Order(symbol="aapl", side="buy", quantity=10, timezone="Europe/Paris")
     con = create_db()
@@ -643,6 +849,18 @@ def test_order_create_db():
     assert len(result) == 10
 
 
+def test_order_create_db_pragmas(tmp_path):
+    con = create_db(str(tmp_path / "orders.sqlite"))
+    assert con.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    # 1 is NORMAL
+    assert con.execute("PRAGMA synchronous").fetchone()[0] == 1
+    assert con.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+    con = create_db()
+    assert con.execute("PRAGMA journal_mode").fetchone()[0] == "memory"
+    order = Order(symbol="aapl", side="buy", quantity=10, connection=con)
+    assert order.save_to_db() is True
+
+
 def test_order_create_db_primary_key_duplicate_error():
     order = Order(
         symbol="aapl", side="buy", quantity=10, timezone="Europe/Paris", id="primary_id"
@@ -666,6 +884,23 @@ def test_order_save_to_db():
         assert row["symbol"] == "aapl"
 
 
+def test_order_save_to_db_same_as_upsert():
+    con = create_db()
+    con2 = create_db()
+    order = Order(
+        symbol="aapl",
+        side="buy",
+        quantity=10,
+        JSON='{"a": [1, 2]}',
+        exchange_timestamp=pendulum.datetime(2023, 1, 1, 10),
+        connection=con,
+    )
+    order.save_to_db()
+    con2["orders"].upsert(order.dict(exclude={"connection"}), pk="id")
+    query = "select * from orders"
+    assert con.execute(query).fetchall() == con2.execute(query).fetchall()
+
+
 def test_order_do_not_save_to_db_if_no_connection():
     order = Order(symbol="aapl", side="buy", quantity=10, timezone="Europe/Paris")
     commit = order.save_to_db()
@@ -687,6 +922,25 @@ def test_order_save_to_db_update():
         assert row["filled_quantity"] == 7
 
 
+@pytest.mark.parametrize("version", [(3, 24, 0), (3, 22, 0)])
+def test_order_save_to_db_sqlite_versions(version):
+    con = create_db()
+    order = Order(symbol="aapl", side="buy", quantity=10, connection=con)
+    with patch("omspy.order._ORDER_UPSERT_SQL", _get_upsert_sql(version)):
+        order.save_to_db()
+        order.filled_quantity = 7
+        order.save_to_db()
+    result = list(con.query("select * from orders"))
+    assert len(result) == 1
+    assert result[0]["filled_quantity"] == 7
+    assert result[0]["id"] == order.id
+
+
+def test_get_upsert_sql():
+    assert "on conflict(id)" in _get_upsert_sql((3, 24, 0))
+    assert _get_upsert_sql((3, 23, 1)).startswith("insert or replace into orders")
+
+
 def test_order_save_to_db_multiple_orders():
     con = create_db()
     order1 = Order(
@@ -817,6 +1071,20 @@ def test_compound_order_update_orders_multiple_connections(simple_compound_order
         assert row["disclosed_quantity"] == 5
 
 
+def test_compound_order_update_orders_single_transaction(simple_compound_order):
+    order = simple_compound_order
+    order.add_order(symbol="beta", quantity=17, side="buy", order_id="dddddd")
+    order_data = {
+        "cccccc": {"filled_quantity": 12, "status": "COMPLETE"},
+        "dddddd": {"exchange_order_id": "some_hex_id"},
+    }
+    with patch("omspy.order._upsert_orders") as upsert:
+        updates = order.update_orders(order_data)
+        upsert.assert_called_once()
+        assert len(upsert.call_args.args[1]) == 2
+    assert updates == {"cccccc": True, "dddddd": True}
+
+
 def test_compound_order_execute_all_default(compound_order):
     order = compound_order
     order.execute_all()
@@ -958,6 +1226,37 @@ def test_order_clone():
             assert getattr(clone, k) == v
 
 
+def test_order_clone_json_not_shared():
+    order = Order(symbol="aapl", side="buy", quantity=10, JSON='{"a": [1, 2]}')
+    for clone in (order.clone(), order.clone(price=100)):
+        clone.JSON["a"].append(3)
+        clone.JSON["b"] = 4
+        assert order.JSON == {"a": [1, 2]}
+
+
+def test_order_clone_kwargs():
+    order = Order(symbol="aapl", side="buy", quantity=10, order_type="LIMIT", price=650)
+    order.add_lock(1, 10)
+    clone = order.clone(side="sell", price=640, order_type="SL", trigger_price=645)
+    assert clone.id != order.id
+    assert (clone.side, clone.price, clone.order_type) == ("sell", 640, "SL")
+    assert clone.trigger_price == 645
+    assert clone.pending_quantity == clone.quantity == 10
+    assert clone._sign == -1
+    assert clone.lock is not order.lock
+    assert order.side == "buy"
+    assert order.price == 650
+    # Keyword arguments are validated
+    clone = order.clone(quantity="20", price="630")
+    assert clone.quantity == 20
+    assert clone.price == 630.0
+    with pytest.raises(ValidationError):
+        order.clone(quantity=-5)
+    clone = order.clone(JSON='{"a": 1}', unknown=1)
+    assert clone.JSON == {"a": 1}
+    assert not (hasattr(clone, "unknown"))
+
+
 def test_order_clone_new_timestamp():
     order = Order(symbol="aapl", side="buy", quantity=10, order_type="LIMIT", price=650)
     clone = order.clone()
@@ -1552,3 +1851,13 @@ def test_compound_order_keys_hashable(order_kwargs):
         com.add_order(**order_kwargs, key={"a": 5})
     assert len(com.orders) == 1
     assert com.get((4, 5)) == com.orders[0]
+
+
+def test_next_id():
+    ids = [_next_id() for _ in range(1000)]
+    assert len(set(ids)) == 1000
+    for i in ids[:10]:
+        uid = uuid.UUID(i)
+        assert uid.hex == i
+        assert uid.version == 4
+        assert uid.variant == uuid.RFC_4122
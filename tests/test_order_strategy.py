@@ -1,6 +1,7 @@
 from omspy.order import Order, CompoundOrder, OrderStrategy, create_db
 import pendulum
 import pytest
+import asyncio
 from unittest.mock import patch
 from collections import Counter
 from omspy.brokers.zerodha import Zerodha
@@ -123,3 +124,72 @@ def test_order_strategy_add(strategy):
     com.add(Order(symbol="xom", quantity=100, side="buy"))
     s.orders.append(com)
     assert len(s.orders) == 3
+
+
+def test_order_strategy_run_with_add(strategy):
+    s = strategy
+    com = CompoundOrderRun(broker=strategy.broker)
+    com.add(Order(symbol="xom", quantity=100, side="buy"))
+    s.add(com)
+    s.add(CompoundOrder(broker=strategy.broker))
+    s.run(dict(xom=108))
+    assert s.orders[2].d == 108
+    assert s._runnable == [com]
+    s.run(dict(xom=110))
+    assert com.d == 110
+
+
+def test_order_strategy_run_orders_replaced(simple):
+    s = simple
+    com = CompoundOrderRun(broker=s.broker)
+    s.add(com)
+    s.run(dict(xom=108))
+    assert com.d == 108
+    # Replaced at the same position
+    com2 = CompoundOrderRun(broker=s.broker)
+    s.orders[0] = com2
+    s.run(dict(xom=110))
+    assert com2.d == 110
+    assert com.d == 108
+    # New list of the same size
+    com3 = CompoundOrderRun(broker=s.broker)
+    s.orders = [com3]
+    asyncio.run(s.arun(dict(xom=112)))
+    assert com3.d == 112
+    assert com2.d == 110
+
+
+def test_order_strategy_arun(strategy):
+    s = strategy
+    com = CompoundOrderRun(broker=strategy.broker)
+    com2 = CompoundOrderRun(broker=strategy.broker)
+    s.add(com)
+    s.add(com2)
+    s.add(CompoundOrderNoRun(broker=strategy.broker))
+    asyncio.run(s.arun(dict(xom=108)))
+    assert com.d == com2.d == 108
+    assert s._runnable == [com, com2]
+
+
+def test_order_strategy_arun_with_connection(new_db):
+    class CompoundOrderSave(CompoundOrder):
+        def run(self, data):
+            for order in self.orders:
+                order.price = data.get(order.symbol)
+                order.execute(broker=self.broker)
+
+    with patch("omspy.brokers.zerodha.Zerodha") as broker:
+        broker.order_place.side_effect = range(100000, 100100)
+        s = OrderStrategy(broker=broker)
+        for symbol in ("xom", "aapl"):
+            com = CompoundOrderSave(broker=broker, connection=new_db)
+            com.add_order(symbol=symbol, side="buy", quantity=10)
+            s.add(com)
+        asyncio.run(s.arun(dict(xom=108, aapl=150)))
+    assert broker.order_place.call_count == 2
+    rows = list(new_db.query("select symbol, price, order_id from orders"))
+    assert sorted((r["symbol"], r["price"]) for r in rows) == [
+        ("aapl", 150),
+        ("xom", 108),
+    ]
+    assert all(r["order_id"] for r in rows)